@@ -0,0 +1,174 @@
+# analytics.py
+import math
+import threading
+from array import array
+from database import get_connection, release_connection, get_table_version
+from utils import optional_import
+
+PERCENTILES = (10, 25, 50, 75, 90)
+MAX_BINS = 50
+
+# Statistics per request, valid while the results table version is unchanged
+_stats_cache = {}
+_cache_lock = threading.Lock()
+STATS_CACHE_SIZE = 256
+
+def _load_columns(subjects, year, semester):
+    """One scan of the slice: group keys plus the marks and credits columns"""
+    query = 'SELECT subject, academic_year, semester, marks, credits FROM results WHERE 1=1'
+    params = []
+    if subjects:
+        query += f" AND subject IN ({','.join('?' * len(subjects))})"
+        params.extend(subjects)
+    if year:
+        query += ' AND academic_year = ?'
+        params.append(year)
+    if semester:
+        query += ' AND semester = ?'
+        params.append(semester)
+
+    groups = {}
+    group_ids = array('l')
+    marks = array('d')
+    credits = array('d')
+    conn = get_connection()
+    try:
+        cursor = conn.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(5000)
+            if not rows:
+                break
+            batch_subjects, batch_years, batch_terms, batch_marks, batch_credits = zip(*rows)
+            group_ids.extend(groups.setdefault(key, len(groups))
+                             for key in zip(batch_subjects, batch_years, batch_terms))
+            marks.extend(batch_marks)
+            credits.extend(batch_credits)
+    finally:
+        release_connection(conn)
+    return list(groups), group_ids, marks, credits
+
+def _bin_index(mark, bins):
+    return min(max(int(mark * bins / 100), 0), bins - 1)
+
+def _numpy_stats(group_count, group_ids, marks, credits, bins):
+    """All groups at once: bincount for moments and histograms, one lexsort for percentiles"""
+    np = optional_import('numpy')
+    g = np.frombuffer(group_ids, dtype=f'i{group_ids.itemsize}').astype(np.int64, copy=False)
+    m = np.frombuffer(marks, dtype=np.float64)
+    c = np.frombuffer(credits, dtype=np.float64)
+
+    counts = np.bincount(g, minlength=group_count)
+    sums = np.bincount(g, weights=m, minlength=group_count)
+    squares = np.bincount(g, weights=m * m, minlength=group_count)
+    credit_sums = np.bincount(g, weights=c, minlength=group_count)
+    means = sums / counts
+    stds = np.sqrt(np.maximum(squares / counts - means * means, 0.0))
+
+    bin_idx = np.clip((m * bins / 100).astype(np.int64), 0, bins - 1)
+    histograms = np.bincount(g * bins + bin_idx, minlength=group_count * bins).reshape(group_count, bins)
+
+    order = np.lexsort((m, g))
+    sorted_marks = m[order]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    ends = starts + counts - 1
+    percentiles = {}
+    for p in PERCENTILES:
+        # Linear interpolation between closest ranks, as numpy.percentile does by default
+        position = starts + (counts - 1) * (p / 100)
+        low = np.floor(position).astype(np.int64)
+        high = np.minimum(low + 1, ends)
+        fraction = position - low
+        percentiles[p] = sorted_marks[low] + (sorted_marks[high] - sorted_marks[low]) * fraction
+
+    mins = sorted_marks[starts]
+    maxs = sorted_marks[ends]
+    return [{
+        'count': int(counts[i]),
+        'mean': float(means[i]),
+        'std': float(stds[i]),
+        'min': float(mins[i]),
+        'max': float(maxs[i]),
+        'percentiles': {p: float(percentiles[p][i]) for p in PERCENTILES},
+        'histogram': histograms[i].tolist(),
+        'credits': float(credit_sums[i]),
+    } for i in range(group_count)]
+
+def _python_stats(group_count, group_ids, marks, credits, bins):
+    """Same statistics without NumPy: split columns by group once, then sort each group"""
+    per_group = [array('d') for _ in range(group_count)]
+    credit_sums = [0.0] * group_count
+    for group, mark, credit in zip(group_ids, marks, credits):
+        per_group[group].append(mark)
+        credit_sums[group] += credit
+
+    stats = []
+    for group, values in enumerate(per_group):
+        values = sorted(values)
+        count = len(values)
+        mean = math.fsum(values) / count
+        variance = math.fsum((value - mean) ** 2 for value in values) / count
+        histogram = [0] * bins
+        for value in values:
+            histogram[_bin_index(value, bins)] += 1
+        percentiles = {}
+        for p in PERCENTILES:
+            position = (count - 1) * (p / 100)
+            low = int(position)
+            high = min(low + 1, count - 1)
+            percentiles[p] = values[low] + (values[high] - values[low]) * (position - low)
+        stats.append({
+            'count': count,
+            'mean': mean,
+            'std': math.sqrt(variance),
+            'min': values[0],
+            'max': values[-1],
+            'percentiles': percentiles,
+            'histogram': histogram,
+            'credits': credit_sums[group],
+        })
+    return stats
+
+def cohort_statistics(subjects=None, year=None, semester=None, bins=10):
+    """Marks statistics per (subject, year, semester) for a slice of results, from a single scan"""
+    subjects = tuple(sorted(set(subjects or ())))
+    bins = min(max(int(bins), 1), MAX_BINS)
+    key = (subjects, year or None, semester or None, bins)
+    version = get_table_version('results')
+    with _cache_lock:
+        cached = _stats_cache.get(key)
+        if cached and cached[0] == version:
+            return cached[1]
+
+    keys, group_ids, marks, credits = _load_columns(subjects, year, semester)
+    # NumPy is optional; without it the same statistics are computed in pure Python
+    if not keys:
+        groups = []
+    elif optional_import('numpy') is not None:
+        groups = _numpy_stats(len(keys), group_ids, marks, credits, bins)
+    else:
+        groups = _python_stats(len(keys), group_ids, marks, credits, bins)
+
+    bin_edges = [round(i * 100 / bins, 2) for i in range(bins + 1)]
+    result = []
+    for (subject, academic_year, term), stats in sorted(zip(keys, groups), key=lambda item: item[0]):
+        result.append({
+            'subject': subject,
+            'academic_year': academic_year,
+            'semester': term,
+            'count': stats['count'],
+            'mean': round(stats['mean'], 2),
+            'median': round(stats['percentiles'][50], 2),
+            'std': round(stats['std'], 2),
+            'min': round(stats['min'], 2),
+            'max': round(stats['max'], 2),
+            'percentiles': {f'p{p}': round(value, 2) for p, value in stats['percentiles'].items()},
+            'histogram': stats['histogram'],
+            'bin_edges': bin_edges,
+            'total_credits': stats['credits'],
+        })
+
+    with _cache_lock:
+        if len(_stats_cache) >= STATS_CACHE_SIZE:
+            _stats_cache.clear()
+        _stats_cache[key] = (version, result)
+    return result
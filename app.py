@@ -2,29 +2,34 @@
 import os
 import re
 import io
+import csv
+import json
+import zlib
+import time
 import logging
-import sqlite3
 from datetime import datetime, timedelta
 from functools import wraps
 from urllib.parse import urlparse, parse_qs
 
 from flask import (
-    Flask, request, jsonify, render_template, session, redirect, send_file, url_for, flash, current_app
+    Flask, request, jsonify, render_template, session, redirect, send_file, url_for, flash, current_app,
+    Response, stream_with_context
 )
-from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 import jwt
 # import requests
-# import gdown
 
 from database import (
     add_student, add_instructor, verify_student, verify_instructor,
-    search_students, add_result, get_student_by_username, get_student_results,
-    init_db, send_message, get_chat_history, get_instructor_by_username,
-    add_future_test, get_all_future_tests, get_future_tests_by_instructor,
+    search_students, add_result, get_student_results,
+    init_db, send_message, get_chat_history,
+    add_future_test, get_future_tests_by_instructor,
     update_future_test, delete_future_test, add_evaluation, get_instructor_evaluations,
-    get_all_instructors, get_student_fullname, get_all_results_joined, filter_results_db
+    get_all_instructors, update_result_db, delete_result_db, close_db,
+    get_results_page, count_results_db, iter_results_export, RESULTS_EXPORT_COLUMNS,
+    add_results_bulk, get_existing_student_ids, get_upcoming_future_tests, get_instructor_evaluation_summary,
+    encode_cursor, decode_cursor, SCHEMA_VERSION, seed_test_users, add_resource, update_resource, delete_resource, get_resource_by_slug
 )
 
 # Import blueprints
@@ -32,6 +37,17 @@ from auth import auth_bp
 from student_routes import student_bp
 from instructor_routes import instructor_bp
 from utils import token_required, protected_route, get_token_from_request, validate_token
+from chat_events import chat_notifier
+from identity import resolve_user, current_student, current_instructor
+from http_cache import cached_response
+from compression import CompressionMiddleware
+from transcript import get_transcript
+from analytics import cohort_statistics
+from resource_store import ResourceStore, send_resource
+from resource_index import resource_index
+from calculator import (
+    calculate as evaluate_expression, ExpressionError, DEFAULT_PRECISION, sample_expression, sample_points
+)
 
 # Configure logging for debugging and error tracking
 logging.basicConfig(level=logging.DEBUG)
@@ -46,36 +62,48 @@ app = Flask(
 
 # Configuration
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-here')
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///study_hub.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['JWT_SECRET_KEY'] = app.config['SECRET_KEY']
 app.config['RESOURCES_FOLDER'] = os.path.join(app.static_folder, 'resources')
 app.config['ALLOWED_EXTENSIONS'] = {'pdf', 'doc', 'docx', 'txt'}
+# Behind nginx/Apache, let the front server stream files with X-Sendfile
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE', '0') in ('1', 'true')
+app.config['COMPRESSION_LEVEL'] = int(os.environ.get('COMPRESSION_LEVEL', 6))
+app.config['COMPRESSION_MIN_SIZE'] = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
 
 # Register blueprints
 app.register_blueprint(auth_bp)
 app.register_blueprint(student_bp)
 app.register_blueprint(instructor_bp)
 
-# Initialize SQLAlchemy with the app for database operations
-db = SQLAlchemy()
-db.init_app(app)
+# Downloaded guides, stored by content hash; tests can swap resource_store.fetcher for a stub
+resource_store = ResourceStore(app.config['RESOURCES_FOLDER'])
+
+# Return each request's pooled database connection when the app context ends
+app.teardown_appcontext(close_db)
+
+# Compress large text/JSON responses for clients that accept gzip or deflate
+app.wsgi_app = CompressionMiddleware(
+    app.wsgi_app,
+    min_size=app.config['COMPRESSION_MIN_SIZE'],
+    level=app.config['COMPRESSION_LEVEL']
+)
 
-# Initialize the database with required tables
+# Bring the schema up to date; a no-op (one PRAGMA read) when the version stamp is current
 init_db()
 
-# Database model for User
-class User(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    fullname = db.Column(db.String(100), nullable=False)
-    email = db.Column(db.String(120), unique=True, nullable=False)
-    password = db.Column(db.String(200), nullable=False)
-    user_type = db.Column(db.String(20), nullable=False)
-    subject = db.Column(db.String(50))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+# Setup steps for the command line: `flask --app app init-db` and `flask --app app seed-users`
+@app.cli.command('init-db')
+def init_db_command():
+    """Create the tables and apply pending migrations."""
+    applied = init_db(force=True)
+    print(f"Database at schema version {SCHEMA_VERSION} (applied: {applied or 'none'})")
 
-    def __repr__(self):
-        return f'<User {self.email}>'
+@app.cli.command('seed-users')
+def seed_users_command():
+    """Create the demo student1/instructor1 accounts."""
+    init_db()
+    created = seed_test_users()
+    print(f"Created: {', '.join(created)}" if created else "Demo users already exist")
 
 # Helper function to validate email format
 def validate_email(email):
@@ -193,11 +221,12 @@ def get_student_results_api():
         if not year or not semester:
             return jsonify({'success': False, 'message': 'Year and semester are required'})
             
-        student = get_student_by_username(username)
+        # One lookup gives both the id and the full name
+        student = resolve_user('student', username)
         if not student:
             return jsonify({'success': False, 'message': 'Student not found'}), 404
             
-        full_name = get_student_fullname(username) or username
+        full_name = student['fullname'] or username
         results = get_student_results(student['id'], year, semester)
         
         return jsonify({
@@ -213,51 +242,162 @@ def get_student_results_api():
         app.logger.error(f"Error getting student results: {str(e)}")
         return jsonify({'success': False, 'message': 'An error occurred while fetching results'}), 500
 
-# API endpoint for getting future tests
+# API endpoint for the student's full transcript: GPA per semester and cumulative GPA
+@app.route('/api/student/transcript')
+@token_required(allowed_types=("student",))
+def get_student_transcript_api():
+    try:
+        student = current_student()
+        if not student:
+            return jsonify({'success': False, 'message': 'Student not found'}), 404
+
+        transcript = get_transcript(student['id'])
+        return jsonify({
+            'success': True,
+            'student_info': {'name': student['fullname'], 'id': student['id']},
+            **transcript
+        })
+    except Exception as e:
+        app.logger.error(f"Error getting transcript: {str(e)}")
+        return jsonify({'success': False, 'message': 'An error occurred while fetching the transcript'}), 500
+
+# API endpoint for getting upcoming future tests (from/to dates, default today onward)
+# Cached until future_tests/instructors change, so unchanged polls get a 304 without a query
 @app.route('/api/student/future-tests')
 @token_required(allowed_types=("student",))
+@cached_response(tables=('future_tests', 'instructors'), key_extra=lambda: datetime.now().strftime('%Y-%m-%d'))
 def get_future_tests():
     try:
-        tests = get_all_future_tests()
-        formatted_tests = []
-        
-        for test in tests:
-            formatted_tests.append({
-                'id': test['id'],
-                'subject': test['subject'],
-                'date': test['test_date'],
-                'time': test['test_time'],
-                'duration': test['duration'],
-                'location': test['location'],
-                'test_type': test['test_type'],
-                'description': test['description'],
-                'instructor_name': test['instructor_name']
-            })
-        
-        return jsonify({'success': True, 'tests': formatted_tests})
+        start_date = request.args.get('from') or datetime.now().strftime('%Y-%m-%d')
+        end_date = request.args.get('to') or None
+        try:
+            for value in filter(None, (start_date, end_date)):
+                datetime.strptime(value, '%Y-%m-%d')
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Dates must use the YYYY-MM-DD format'}), 400
+
+        tests = get_upcoming_future_tests(start_date, end_date)
+        return jsonify({'success': True, 'tests': tests})
     except Exception as e:
         app.logger.error(f"Error getting future tests: {str(e)}")
         return jsonify({'success': False, 'message': 'An error occurred while fetching future tests'}), 500
 
-# API endpoint for getting learning resources
+# Helper: learning resource as sent to the browser; Drive guides link to the local download route
+def resource_to_json(resource):
+    link = resource['url']
+    if resource['drive_file_id'] and resource['slug']:
+        link = url_for('download_resource', resource_type=resource['slug'])
+    return {
+        'id': resource['id'],
+        'title': resource['title'],
+        'description': resource['description'],
+        'subject': resource['subject'],
+        'type': resource['resource_type'],
+        'tags': resource['tags'],
+        'link': link
+    }
+
+# API endpoint for searching learning resources (q, subject, tag, type; paginated with an opaque cursor)
 @app.route('/api/student/resources')
 @token_required(allowed_types=("student",))
+@cached_response(tables=('resources',))
 def get_learning_resources():
-    # Mock learning resources data - Replace with actual database query
-    resources = [
-        {
-            'title': 'Mathematics Formula Sheet',
-            'description': 'Complete formula sheet for calculus and algebra',
-            'link': 'https://example.com/math-formulas'
-        },
-        {
-            'title': 'Physics Video Lectures',
-            'description': 'Video lectures covering mechanics and thermodynamics',
-            'link': 'https://example.com/physics-lectures'
+    try:
+        try:
+            page_size = min(max(int(request.args.get('page_size', 20)), 1), 100)
+            cursor_value = request.args.get('cursor')
+            after = decode_cursor(cursor_value, 2) if cursor_value else None
+            if after and not (isinstance(after[0], str) and isinstance(after[1], int)):
+                raise ValueError('Invalid cursor')
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Invalid page_size or cursor'}), 400
+
+        resources, total, next_key = resource_index.search(
+            request.args.get('q', ''),
+            subject=request.args.get('subject'),
+            tag=request.args.get('tag'),
+            resource_type=request.args.get('type'),
+            after=after,
+            limit=page_size
+        )
+        response = {
+            'success': True,
+            'resources': [resource_to_json(resource) for resource in resources],
+            'total': total,
+            'next_cursor': encode_cursor(next_key) if next_key else None
         }
-    ]
-    
-    return jsonify({'success': True, 'resources': resources})
+        # Filter options only with the first page
+        if not cursor_value:
+            response['facets'] = resource_index.facets()
+        return jsonify(response)
+    except Exception as e:
+        app.logger.error(f"Error searching resources: {str(e)}")
+        return jsonify({'success': False, 'message': 'An error occurred while fetching resources'}), 500
+
+# Helper: resource fields from a JSON body, or an error message
+def resource_fields(data):
+    title = str(data.get('title', '')).strip()
+    resource_type = str(data.get('type', '')).strip().lower()
+    if not title or not resource_type:
+        return None, 'Title and type are required'
+    url = data.get('url') or None
+    # Drive links become locally served downloads when the resource also has a slug
+    drive_file_id = data.get('drive_file_id') or (get_google_drive_file_id(url) if url else None)
+    if not url and not drive_file_id:
+        return None, 'Either url or drive_file_id is required'
+    return {
+        'title': title,
+        'description': str(data.get('description', '')).strip(),
+        'subject': (str(data.get('subject') or '').strip() or None),
+        'resource_type': resource_type,
+        'tags': data.get('tags') or (),
+        'url': url,
+        'drive_file_id': drive_file_id,
+        'slug': (secure_filename(str(data.get('slug') or '')) or None)
+    }, None
+
+# API endpoint for adding a learning resource
+@app.route('/api/resources', methods=['POST'])
+@token_required(allowed_types=("instructor",))
+def create_resource():
+    try:
+        fields, error = resource_fields(request.get_json(silent=True) or {})
+        if error:
+            return jsonify({'success': False, 'message': error}), 400
+        resource_id = add_resource(**fields)
+        if resource_id is None:
+            return jsonify({'success': False, 'message': 'Failed to add resource'}), 400
+        return jsonify({'success': True, 'id': resource_id}), 201
+    except Exception as e:
+        app.logger.error(f"Error adding resource: {str(e)}")
+        return jsonify({'success': False, 'message': 'An error occurred while adding the resource'}), 500
+
+# API endpoint for updating a learning resource
+@app.route('/api/resources/<int:resource_id>', methods=['PUT'])
+@token_required(allowed_types=("instructor",))
+def edit_resource(resource_id):
+    try:
+        fields, error = resource_fields(request.get_json(silent=True) or {})
+        if error:
+            return jsonify({'success': False, 'message': error}), 400
+        if not update_resource(resource_id, **fields):
+            return jsonify({'success': False, 'message': 'Resource not found'}), 404
+        return jsonify({'success': True})
+    except Exception as e:
+        app.logger.error(f"Error updating resource: {str(e)}")
+        return jsonify({'success': False, 'message': 'An error occurred while updating the resource'}), 500
+
+# API endpoint for deleting a learning resource
+@app.route('/api/resources/<int:resource_id>', methods=['DELETE'])
+@token_required(allowed_types=("instructor",))
+def remove_resource(resource_id):
+    try:
+        if not delete_resource(resource_id):
+            return jsonify({'success': False, 'message': 'Resource not found'}), 404
+        return jsonify({'success': True})
+    except Exception as e:
+        app.logger.error(f"Error deleting resource: {str(e)}")
+        return jsonify({'success': False, 'message': 'An error occurred while deleting the resource'}), 500
 
 # API endpoint for getting student info
 @app.route('/api/student/info')
@@ -266,19 +406,15 @@ def get_student_info():
     # Get username from the already validated token (set by the decorator)
     username = request.user['user']
     
-    # Fetch full name and id from the database
-    conn = sqlite3.connect('study_hub.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT fullname, id FROM students WHERE username = ? OR email = ?', (username, username))
-    row = cursor.fetchone()
-    conn.close()
+    # Resolve the student record (cached across requests)
+    row = current_student()
     
     if not row:
         return jsonify({'success': False, 'message': 'Student not found'}), 404
     
     student_info = {
-        'fullname': row[0],
-        'id': row[1],
+        'fullname': row['fullname'],
+        'id': row['id'],
         'username': username
     }
     return jsonify({'success': True, 'student_info': student_info})
@@ -292,7 +428,10 @@ def search_students_api():
         if not search_term:
             return jsonify({'success': False, 'message': 'Search term is required'}), 400
 
-        students = search_students(search_term)
+        # Cap the number of matches so every keystroke stays cheap
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+
+        students = search_students(search_term, limit=limit)
         return jsonify({'success': True, 'students': students})
     except Exception as e:
         app.logger.error(f"Error searching students: {str(e)}")
@@ -339,6 +478,122 @@ def submit_result():
         app.logger.error(f"Error adding result: {str(e)}")
         return jsonify({'success': False, 'message': 'An error occurred while adding the result'}), 500
 
+# Helper: build a keyset-paginated results response from page_size, cursor and include_total args
+def results_page_response(student='', subject='', year='', semester='', student_id=None):
+    page_size = min(max(request.args.get('page_size', 100, type=int), 1), 500)
+    cursor = request.args.get('cursor') or None
+
+    try:
+        rows, next_cursor = get_results_page(student, subject, year, semester, page_size, cursor, student_id)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid cursor'}), 400
+
+    formatted_results = [{
+        'id': row[0],
+        'student_name': row[1],
+        'subject': row[2],
+        'marks': row[3],
+        'grade': row[4],
+        'credits': row[5],
+        'academic_year': row[6],
+        'semester': row[7]
+    } for row in rows]
+
+    response = {'success': True, 'results': formatted_results, 'next_cursor': next_cursor}
+    if request.args.get('include_total') in ('1', 'true'):
+        response['total'] = count_results_db(student, subject, year, semester, student_id)
+    return jsonify(response)
+
+# Fields every submitted result must carry
+RESULT_FIELDS = ['student_id', 'subject', 'marks', 'grade', 'credits', 'academic_year', 'semester']
+
+# Helper: validate one submitted result, returning (row tuple, list of errors)
+def validate_result_row(data):
+    if not isinstance(data, dict):
+        return None, ['Result must be an object']
+
+    errors = [f'Missing required field: {field}' for field in RESULT_FIELDS
+              if data.get(field) in (None, '')]
+    if errors:
+        return None, errors
+
+    def as_int(field):
+        try:
+            return int(data[field])
+        except (TypeError, ValueError):
+            errors.append(f'{field} must be an integer')
+            return None
+
+    student_id = as_int('student_id')
+    marks = as_int('marks')
+    credits = as_int('credits')
+    if marks is not None and not 0 <= marks <= 100:
+        errors.append('marks must be between 0 and 100')
+    if credits is not None and credits < 0:
+        errors.append('credits must not be negative')
+    if errors:
+        return None, errors
+
+    return (student_id, str(data['subject']).strip(), marks, str(data['grade']).strip(), credits,
+            str(data['semester']).strip(), str(data['academic_year']).strip()), []
+
+# API endpoint for submitting many results at once (JSON array or CSV upload)
+@app.route('/api/results/bulk', methods=['POST'])
+@token_required(allowed_types=("instructor",))
+def submit_results_bulk():
+    try:
+        # Accept a CSV file upload, a raw CSV body, or a JSON array (optionally wrapped in {"results": [...]})
+        if 'file' in request.files:
+            text = request.files['file'].read().decode('utf-8-sig')
+            items = list(csv.DictReader(io.StringIO(text)))
+        elif request.mimetype == 'text/csv':
+            items = list(csv.DictReader(io.StringIO(request.get_data().decode('utf-8-sig'))))
+        else:
+            items = request.get_json(silent=True)
+            if isinstance(items, dict):
+                items = items.get('results')
+        if not isinstance(items, list) or not items:
+            return jsonify({'success': False, 'message': 'Provide a non-empty list of results'}), 400
+
+        atomic = request.args.get('atomic') in ('1', 'true')
+
+        # Validate everything in one pass, then check all student ids with a single lookup
+        rows = []
+        errors = []
+        for index, item in enumerate(items):
+            row, row_errors = validate_result_row(item)
+            if row_errors:
+                errors.append({'row': index, 'errors': row_errors})
+            else:
+                rows.append((index, row))
+
+        existing_ids = get_existing_student_ids([row[0] for _, row in rows])
+        valid_rows = []
+        for index, row in rows:
+            if row[0] in existing_ids:
+                valid_rows.append(row)
+            else:
+                errors.append({'row': index, 'errors': [f'Student {row[0]} not found']})
+        errors.sort(key=lambda error: error['row'])
+
+        if errors and atomic:
+            return jsonify({'success': False, 'inserted': 0, 'errors': errors,
+                            'message': 'No results added because some rows are invalid'}), 400
+
+        inserted = add_results_bulk(valid_rows) if valid_rows else 0
+        return jsonify({
+            'success': not errors,
+            'inserted': inserted,
+            'errors': errors,
+            'message': f'{inserted} result(s) added' + (f', {len(errors)} rejected' if errors else '')
+        })
+    except UnicodeDecodeError:
+        # e.g. a Latin-1 CSV saved from Excel
+        return jsonify({'success': False, 'message': 'CSV must be UTF-8 encoded'}), 400
+    except Exception as e:
+        app.logger.error(f"Error adding results in bulk: {str(e)}")
+        return jsonify({'success': False, 'message': 'An error occurred while adding the results'}), 500
+
 # API endpoint for getting all results
 @app.route('/api/results')
 def get_all_results():
@@ -354,21 +609,8 @@ def get_all_results():
         if not user_data:
             return jsonify({'success': False, 'message': 'Invalid token type'}), 401
 
-        # Get all results via database helper
-        results = get_all_results_joined()
-
-        formatted_results = [{
-            'id': row[0],
-            'student_name': row[1],
-            'subject': row[2],
-            'marks': row[3],
-            'grade': row[4],
-            'credits': row[5],
-            'academic_year': row[6],
-            'semester': row[7]
-        } for row in results]
-
-        return jsonify({'success': True, 'results': formatted_results})
+        # Get one page of results via database helper
+        return results_page_response()
     except Exception as e:
         app.logger.error(f"Error getting results: {str(e)}")
         return jsonify({'success': False, 'message': 'An error occurred while fetching results'}), 500
@@ -393,26 +635,103 @@ def filter_results():
         subject = request.args.get('subject', '')
         year = request.args.get('year', '')
         semester = request.args.get('semester', '')
+        # Exact student id; "student" is a substring match on name, username or id
+        student_id = request.args.get('student_id')
+        if student_id is not None:
+            if not student_id.isdigit():
+                return jsonify({'success': False, 'message': 'student_id must be a number'}), 400
+            student_id = int(student_id)
 
         # Execute via helper
-        results = filter_results_db(student, subject, year, semester)
-
-        formatted_results = [{
-            'id': row[0],
-            'student_name': row[1],
-            'subject': row[2],
-            'marks': row[3],
-            'grade': row[4],
-            'credits': row[5],
-            'academic_year': row[6],
-            'semester': row[7]
-        } for row in results]
-
-        return jsonify({'success': True, 'results': formatted_results})
+        return results_page_response(student, subject, year, semester, student_id)
     except Exception as e:
         app.logger.error(f"Error filtering results: {str(e)}")
         return jsonify({'success': False, 'message': 'An error occurred while filtering results'}), 500
 
+# Helper: export batches encoded as CSV (with header row) or NDJSON byte chunks
+def encode_export(batches, export_format):
+    if export_format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(RESULTS_EXPORT_COLUMNS)
+        yield buffer.getvalue().encode('utf-8')
+        for rows in batches:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(rows)
+            yield buffer.getvalue().encode('utf-8')
+    else:
+        for rows in batches:
+            yield ''.join(
+                json.dumps(dict(zip(RESULTS_EXPORT_COLUMNS, row))) + '\n' for row in rows
+            ).encode('utf-8')
+
+# Helper: gzip a stream of byte chunks
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+# API endpoint for exporting results as a streamed CSV or NDJSON download
+@app.route('/api/results/export')
+@token_required(allowed_types=("instructor",))
+def export_results():
+    try:
+        export_format = request.args.get('format', 'csv').lower()
+        if export_format not in ('csv', 'ndjson'):
+            return jsonify({'success': False, 'message': 'Format must be csv or ndjson'}), 400
+        use_gzip = request.args.get('gzip') in ('1', 'true')
+
+        # Same filters as /api/results/filter
+        batches = iter_results_export(
+            request.args.get('student', ''),
+            request.args.get('subject', ''),
+            request.args.get('year', ''),
+            request.args.get('semester', '')
+        )
+
+        body = encode_export(batches, export_format)
+        filename = f"results.{export_format}"
+        mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+        if use_gzip:
+            body = gzip_chunks(body)
+            filename += '.gz'
+            mimetype = 'application/gzip'
+
+        return Response(
+            stream_with_context(body),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
+        )
+    except Exception as e:
+        app.logger.error(f"Error exporting results: {str(e)}")
+        return jsonify({'success': False, 'message': 'An error occurred while exporting results'}), 500
+
+# API endpoint for marks statistics per subject, year and semester (subject may repeat)
+@app.route('/api/results/statistics')
+@token_required(allowed_types=("instructor",))
+@cached_response(tables=('results',))
+def get_results_statistics():
+    try:
+        try:
+            bins = int(request.args.get('bins', 10))
+        except ValueError:
+            return jsonify({'success': False, 'message': 'bins must be an integer'}), 400
+
+        statistics = cohort_statistics(
+            [subject for subject in request.args.getlist('subject') if subject],
+            request.args.get('year', ''),
+            request.args.get('semester', ''),
+            bins
+        )
+        return jsonify({'success': True, 'statistics': statistics})
+    except Exception as e:
+        app.logger.error(f"Error computing statistics: {str(e)}")
+        return jsonify({'success': False, 'message': 'An error occurred while computing statistics'}), 500
+
 # API endpoint for updating a result
 @app.route('/api/results/<int:result_id>', methods=['PUT'])
 def update_result(result_id):
@@ -438,15 +757,8 @@ def update_result(result_id):
             return jsonify({'success': False, 'message': 'Missing required fields'}), 400
 
         # Update result in database
-        conn = sqlite3.connect('study_hub.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE results
-            SET marks = ?, grade = ?, credits = ?
-            WHERE id = ?
-        ''', (marks, grade, credits, result_id))
-        conn.commit()
-        conn.close()
+        if not update_result_db(result_id, marks, grade, credits):
+            return jsonify({'success': False, 'message': 'Result not found'}), 404
 
         return jsonify({'success': True, 'message': 'Result updated successfully'})
     except Exception as e:
@@ -469,11 +781,8 @@ def delete_result(result_id):
             return jsonify({'success': False, 'message': 'Invalid token type'}), 401
 
         # Delete result from database
-        conn = sqlite3.connect('study_hub.db')
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM results WHERE id = ?', (result_id,))
-        conn.commit()
-        conn.close()
+        if not delete_result_db(result_id):
+            return jsonify({'success': False, 'message': 'Result not found'}), 404
 
         return jsonify({'success': True, 'message': 'Result deleted successfully'})
     except Exception as e:
@@ -494,52 +803,14 @@ def download_resource(resource_type):
         if not user_data:
             return jsonify({'error': 'Unauthorized'}), 403
 
-        # Map resource types to their Google Drive URLs
-        resource_urls = {
-            'python': 'https://drive.google.com/file/d/17-onD-fMI7gKBQjtN8i1y2Skl_EqgDCN/view',
-            'javascript': 'https://drive.google.com/file/d/17-onD-fMI7gKBQjtN8i1y2Skl_EqgDCN/view',
-            'data-structures': 'https://drive.google.com/file/d/17-onD-fMI7gKBQjtN8i1y2Skl_EqgDCN/view'
-        }
-
-        if resource_type not in resource_urls:
+        # Downloadable guides are catalog entries with a slug and a Drive file
+        resource = get_resource_by_slug(resource_type)
+        if not resource or not resource['drive_file_id']:
             return jsonify({'error': 'Invalid resource type'}), 400
+        file_id = resource['drive_file_id']
 
-        # Get the Google Drive URL
-        drive_url = resource_urls[resource_type]
-        
-        # Extract file ID from Google Drive URL
-        file_id = get_google_drive_file_id(drive_url)
-        if not file_id:
-            return jsonify({'error': 'Invalid Google Drive URL'}), 400
-
-        # Create resources directory if it doesn't exist
-        os.makedirs(app.config['RESOURCES_FOLDER'], exist_ok=True)
-
-        # Generate a secure filename
         filename = secure_filename(f"{resource_type}_guide.pdf")
-        file_path = os.path.join(app.config['RESOURCES_FOLDER'], filename)
-
-        # Download the file if it doesn't exist locally
-        if not os.path.exists(file_path):
-            try:
-                # Use gdown for downloading from Google Drive
-                url = f"https://drive.google.com/uc?id={file_id}"
-                gdown.download(url, file_path, quiet=False)
-            except Exception as e:
-                app.logger.error(f"Error downloading file: {str(e)}")
-                return jsonify({'error': 'Failed to download resource'}), 500
-
-        # Check if file exists and is allowed
-        if not os.path.exists(file_path) or not allowed_file(filename):
-            return jsonify({'error': 'Resource not found'}), 404
-
-        # Send the file
-        return send_file(
-            file_path,
-            as_attachment=True,
-            download_name=filename,
-            mimetype='application/pdf'
-        )
+        return serve_drive_resource(file_id, filename)
 
     except Exception as e:
         app.logger.error(f"Error in download_resource: {str(e)}")
@@ -565,6 +836,17 @@ def allowed_file(filename):
     """Check if the file extension is allowed."""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
 
+def serve_drive_resource(file_id, filename):
+    """Serve a Drive file from the local store, fetching it once on first request."""
+    if not allowed_file(filename):
+        return jsonify({'error': 'Resource not found'}), 404
+    try:
+        resource = resource_store.fetch(filename, file_id)
+    except Exception as e:
+        app.logger.error(f"Error downloading file: {str(e)}")
+        return jsonify({'error': 'Failed to download resource'}), 500
+    return send_resource(resource, filename, 'application/pdf')
+
 # Add this new route for Google Drive downloads
 @app.route('/api/coding-resources/download/<file_id>')
 def download_from_drive(file_id):
@@ -579,34 +861,10 @@ def download_from_drive(file_id):
         if not user_data:
             return jsonify({'error': 'Unauthorized'}), 403
 
-        # Create resources directory if it doesn't exist
-        os.makedirs(app.config['RESOURCES_FOLDER'], exist_ok=True)
-
-        # Generate a secure filename
+        if '-' not in file_id:
+            return jsonify({'error': 'Invalid file id'}), 400
         filename = secure_filename(f"{file_id.split('-')[1]}_guide.pdf")
-        file_path = os.path.join(app.config['RESOURCES_FOLDER'], filename)
-
-        # Download the file if it doesn't exist locally
-        if not os.path.exists(file_path):
-            try:
-                # Use gdown for downloading from Google Drive
-                url = f"https://drive.google.com/uc?id={file_id}"
-                gdown.download(url, file_path, quiet=False)
-            except Exception as e:
-                app.logger.error(f"Error downloading file: {str(e)}")
-                return jsonify({'error': 'Failed to download resource'}), 500
-
-        # Check if file exists and is allowed
-        if not os.path.exists(file_path) or not allowed_file(filename):
-            return jsonify({'error': 'Resource not found'}), 404
-
-        # Send the file
-        return send_file(
-            file_path,
-            as_attachment=True,
-            download_name=filename,
-            mimetype='application/pdf'
-        )
+        return serve_drive_resource(file_id, filename)
 
     except Exception as e:
         app.logger.error(f"Error in download_from_drive: {str(e)}")
@@ -645,7 +903,8 @@ def chat_send():
         app.logger.error(f"Error sending chat message: {str(e)}")
         return jsonify({'success': False, 'message': 'Internal server error'}), 500
 
-# API endpoint to fetch chat history between two users
+# API endpoint to fetch chat history between two users, latest page first
+# before_id scrolls back to older messages, after_id returns only newer ones
 @app.route('/api/chat/history', methods=['GET'])
 def chat_history():
     try:
@@ -659,16 +918,104 @@ def chat_history():
             
         user = user_data.get('user')
         other_user = request.args.get('other_user')
+        after_id = request.args.get('after_id', type=int)
+        before_id = request.args.get('before_id', type=int)
+        limit = min(max(request.args.get('limit', 100, type=int), 1), 500)
         
         if not other_user:
             return jsonify({'success': False, 'message': 'other_user parameter is required'}), 400
             
-        messages = get_chat_history(user, other_user)
-        return jsonify({'success': True, 'messages': messages})
+        messages = get_chat_history(user, other_user, limit=limit, after_id=after_id, before_id=before_id)
+
+        # Cursor for the previous page when scrolling back through the conversation
+        next_before_id = None
+        if after_id is None and len(messages) == limit:
+            next_before_id = messages[0]['id']
+        return jsonify({'success': True, 'messages': messages, 'next_before_id': next_before_id})
     except Exception as e:
         app.logger.error(f"Error fetching chat history: {str(e)}")
         return jsonify({'success': False, 'message': 'Internal server error'}), 500
 
+# How long a chat long-poll may be held, and how often waiters re-check the database
+# for messages written by other worker processes
+CHAT_POLL_TIMEOUT = 25
+CHAT_RECHECK_INTERVAL = 5
+CHAT_KEEPALIVE_INTERVAL = 15
+
+# API endpoint to long-poll for messages newer than after_id
+@app.route('/api/chat/poll', methods=['GET'])
+def chat_poll():
+    try:
+        token = get_token_from_request()
+        if not token:
+            return jsonify({'success': False, 'message': 'Authentication required'}), 401
+
+        user_data = validate_token(token)
+        if not user_data:
+            return jsonify({'success': False, 'message': 'Invalid token'}), 401
+
+        user = user_data.get('user')
+        other_user = request.args.get('other_user')
+        after_id = request.args.get('after_id', 0, type=int)
+        timeout = min(max(request.args.get('timeout', CHAT_POLL_TIMEOUT, type=float), 0), CHAT_POLL_TIMEOUT)
+
+        if not other_user:
+            return jsonify({'success': False, 'message': 'other_user parameter is required'}), 400
+
+        deadline = time.monotonic() + timeout
+        while True:
+            # Read the version before querying so a message sent in between still wakes us
+            version = chat_notifier.version(user, other_user)
+            messages = get_chat_history(user, other_user, after_id=after_id)
+            remaining = deadline - time.monotonic()
+            if messages or remaining <= 0:
+                return jsonify({'success': True, 'messages': messages})
+            # Don't hold a pooled connection while idle
+            close_db()
+            chat_notifier.wait(user, other_user, version, min(remaining, CHAT_RECHECK_INTERVAL))
+    except Exception as e:
+        app.logger.error(f"Error polling chat messages: {str(e)}")
+        return jsonify({'success': False, 'message': 'Internal server error'}), 500
+
+# API endpoint streaming new messages of a conversation as Server-Sent Events
+@app.route('/api/chat/stream', methods=['GET'])
+def chat_stream():
+    token = get_token_from_request()
+    if not token:
+        return jsonify({'success': False, 'message': 'Authentication required'}), 401
+
+    user_data = validate_token(token)
+    if not user_data:
+        return jsonify({'success': False, 'message': 'Invalid token'}), 401
+
+    user = user_data.get('user')
+    other_user = request.args.get('other_user')
+    if not other_user:
+        return jsonify({'success': False, 'message': 'other_user parameter is required'}), 400
+
+    # EventSource resends the last id it saw when it reconnects
+    after_id = request.headers.get('Last-Event-ID', type=int)
+    if after_id is None:
+        after_id = request.args.get('after_id', 0, type=int)
+
+    # Runs outside the app context, so each query borrows a pooled connection only briefly
+    def events(after_id):
+        last_sent = time.monotonic()
+        yield 'retry: 3000\n\n'
+        while True:
+            version = chat_notifier.version(user, other_user)
+            for message in get_chat_history(user, other_user, after_id=after_id):
+                after_id = message['id']
+                last_sent = time.monotonic()
+                yield f"id: {message['id']}\ndata: {json.dumps(message)}\n\n"
+            if time.monotonic() - last_sent >= CHAT_KEEPALIVE_INTERVAL:
+                last_sent = time.monotonic()
+                yield ': keepalive\n\n'
+            chat_notifier.wait(user, other_user, version, CHAT_RECHECK_INTERVAL)
+
+    return Response(events(after_id), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 # Route to render the chat page
 @app.route('/chat')
 def chat_page():
@@ -681,8 +1028,7 @@ def chat_page():
 def get_instructor_future_tests():
     try:
         # Get instructor info from the token (already validated by decorator)
-        username = request.user['user']
-        instructor = get_instructor_by_username(username)
+        instructor = current_instructor()
         if not instructor:
             return jsonify({'success': False, 'message': 'Instructor not found'}), 404
 
@@ -698,8 +1044,7 @@ def get_instructor_future_tests():
 def add_future_test_api():
     try:
         # Get instructor info from the token (already validated by decorator)
-        username = request.user['user']
-        instructor = get_instructor_by_username(username)
+        instructor = current_instructor()
         if not instructor:
             return jsonify({'success': False, 'message': 'Instructor not found'}), 404
 
@@ -780,6 +1125,7 @@ def delete_future_test_api(test_id):
 # API endpoint for getting all instructors (for student evaluation)
 @app.route('/api/instructors')
 @token_required(allowed_types=("student",))
+@cached_response(tables=('instructors',))
 def get_instructors_api():
     try:
         instructors = get_all_instructors()
@@ -794,8 +1140,7 @@ def get_instructors_api():
 def submit_evaluation():
     try:
         # Get student info from token
-        username = request.user['user']
-        student = get_student_by_username(username)
+        student = current_student()
         if not student:
             return jsonify({'success': False, 'message': 'Student not found'}), 404
 
@@ -826,25 +1171,61 @@ def submit_evaluation():
         app.logger.error(f"Error submitting evaluation: {str(e)}")
         return jsonify({'success': False, 'message': 'An error occurred while submitting evaluation'}), 500
 
-# API endpoint for getting instructor's evaluations
+# API endpoint for getting instructor's evaluations (raw comments, newest first, paginated)
 @app.route('/api/instructor/evaluations')
 @token_required(allowed_types=("instructor",))
+@cached_response(tables=('evaluations', 'students', 'instructors'), per_user=True)
 def get_evaluations_api():
     try:
         # Get instructor info from token
-        username = request.user['user']
-        instructor = get_instructor_by_username(username)
+        instructor = current_instructor()
         if not instructor:
             return jsonify({'success': False, 'message': 'Instructor not found'}), 404
 
-        evaluations = get_instructor_evaluations(instructor['id'])
-        return jsonify({'success': True, 'evaluations': evaluations})
+        page_size = min(max(request.args.get('page_size', 20, type=int), 1), 100)
+        try:
+            evaluations, next_cursor = get_instructor_evaluations(
+                instructor['id'], page_size=page_size, cursor_value=request.args.get('cursor') or None
+            )
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Invalid cursor'}), 400
+        return jsonify({'success': True, 'evaluations': evaluations, 'next_cursor': next_cursor})
     except Exception as e:
         app.logger.error(f"Error getting evaluations: {str(e)}")
         return jsonify({'success': False, 'message': 'An error occurred while fetching evaluations'}), 500
 
+# API endpoint for an instructor's rating averages and histograms per subject and term
+@app.route('/api/instructor/evaluations/summary')
+@token_required(allowed_types=("instructor",))
+@cached_response(tables=('evaluations', 'instructors'), per_user=True)
+def get_evaluation_summary_api():
+    try:
+        instructor = current_instructor()
+        if not instructor:
+            return jsonify({'success': False, 'message': 'Instructor not found'}), 404
+
+        groups = get_instructor_evaluation_summary(instructor['id'])
+        metrics = ('teaching_quality', 'course_content', 'communication', 'overall_rating')
+
+        def with_averages(group):
+            count = group['evaluations']
+            for metric in metrics:
+                group[f'{metric}_avg'] = round(group[f'{metric}_sum'] / count, 2) if count else 0
+            return group
+
+        totals = {'evaluations': sum(group['evaluations'] for group in groups),
+                  'overall_histogram': [sum(column) for column in zip(*(g['overall_histogram'] for g in groups))] or [0] * 5}
+        for metric in metrics:
+            totals[f'{metric}_sum'] = sum(group[f'{metric}_sum'] for group in groups)
+        with_averages(totals)
+        totals['highest_rating'] = max((i + 1 for i, n in enumerate(totals['overall_histogram']) if n), default=0)
+
+        return jsonify({'success': True, 'summary': [with_averages(group) for group in groups], 'totals': totals})
+    except Exception as e:
+        app.logger.error(f"Error getting evaluation summary: {str(e)}")
+        return jsonify({'success': False, 'message': 'An error occurred while fetching the evaluation summary'}), 500
+
 
-MATH_API_URL = "https://api.mathjs.org/v4/"
 WOLFRAM_API_URL = "https://api.wolframalpha.com/v1/result"
 
 # Sample math topics and resources for students
@@ -892,31 +1273,52 @@ def math():
     return render_template("math.html")
 
 @app.route("/api/math-topics")
+@cached_response(max_age=3600)
 def get_math_topics():
     return jsonify(MATH_TOPICS)
 
 @app.route("/api/calculate", methods=["POST"])
 def calculate():
     try:
-        data = request.get_json()
-        expression = data.get('expression', '')
-        
-        # Use MathJax API for calculations
-        response = requests.post(MATH_API_URL, json={
-            "expr": expression,
-            "precision": 14
-        })
-        
-        if response.status_code == 200:
-            result = response.json()
-            return jsonify({"result": result.get('result', 'Error in calculation')})
-        else:
-            return jsonify({"error": "Calculation failed"}), 400
-            
+        data = request.get_json(silent=True) or {}
+        expression = str(data.get('expression', ''))
+        precision = data.get('precision', DEFAULT_PRECISION)
+
+        # Evaluated in-process against a whitelist of arithmetic, trig, log and constants
+        value, result = evaluate_expression(expression, precision)
+        return jsonify({"result": result, "value": value})
+    except (ExpressionError, TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        app.logger.error(f"Error calculating expression: {str(e)}")
+        return jsonify({"error": "Calculation failed"}), 500
+
+@app.route("/api/calculate/sample", methods=["POST"])
+def sample_function():
+    try:
+        data = request.get_json(silent=True) or {}
+        expression = str(data.get('expression', ''))
+
+        # Either explicit points {"x": [...]} or a range {"start", "stop", "points"}
+        if 'x' in data:
+            if not isinstance(data['x'], list):
+                return jsonify({"error": "x must be an array of numbers"}), 400
+            xs = [float(x) for x in data['x']]
+            ys = sample_expression(expression, xs)
+            return jsonify({"y": ys})
+
+        xs = sample_points(data.get('start', -10), data.get('stop', 10), data.get('points', 1000))
+        ys = sample_expression(expression, xs)
+        # The client rebuilds x from the range, so only y is sent back
+        return jsonify({"start": xs[0], "stop": xs[-1], "points": len(xs), "y": ys})
+    except (ExpressionError, TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        app.logger.error(f"Error sampling expression: {str(e)}")
+        return jsonify({"error": "Sampling failed"}), 500
 
 @app.route("/api/topic/<topic_name>")
+@cached_response(max_age=3600)
 def get_topic_details(topic_name):
     if topic_name in MATH_TOPICS:
         return jsonify(MATH_TOPICS[topic_name])
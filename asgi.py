@@ -0,0 +1,458 @@
+# asgi.py
+"""Optional ASGI entry point serving the same routes as app.py.
+
+Chat long-poll, chat SSE and the results export run as coroutines, so an idle connection costs
+no thread; every other route goes through the Flask app on a bounded thread pool, which also
+runs all database calls. Run it with any ASGI server, e.g.
+
+    uvicorn asgi:application
+    hypercorn asgi:application
+"""
+import io
+import os
+import sys
+import json
+import time
+import asyncio
+import threading
+import functools
+from http.cookies import SimpleCookie, CookieError
+from urllib.parse import parse_qs
+from concurrent.futures import ThreadPoolExecutor
+
+from app import (
+    app as flask_app, CHAT_POLL_TIMEOUT, CHAT_RECHECK_INTERVAL, CHAT_KEEPALIVE_INTERVAL,
+    encode_export, gzip_chunks
+)
+from database import init_db, get_chat_history, iter_results_export, shutdown_write_queue
+from chat_events import chat_notifier
+from passwords import shutdown_password_pool
+from utils import decode_token, optional_import
+
+# Threads running Flask views and database calls; bounds concurrent SQLite work per process
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 16))
+
+# Seconds shutdown waits for in-flight requests before stopping the thread pool
+ASGI_SHUTDOWN_GRACE = float(os.environ.get('ASGI_SHUTDOWN_GRACE', 10))
+
+# Largest request body buffered for a Flask view
+MAX_BODY_SIZE = 64 * 1024 * 1024
+
+# Read size for files sent by send_file (downloads)
+FILE_BLOCK_SIZE = 256 * 1024
+
+# Chunks a Flask response may run ahead of a slow client
+RESPONSE_QUEUE_SIZE = 8
+
+class _FileWrapper:
+    """wsgi.file_wrapper: lets the server read send_file's file itself, a block per pool job"""
+
+    def __init__(self, file, block_size=FILE_BLOCK_SIZE):
+        self.file = file
+        # Werkzeug always asks for 8 KiB; reading at least FILE_BLOCK_SIZE keeps pool jobs per download low
+        self.block_size = max(block_size, FILE_BLOCK_SIZE)
+
+    def __iter__(self):
+        while True:
+            data = self.file.read(self.block_size)
+            if not data:
+                break
+            yield data
+
+    def close(self):
+        self.file.close()
+
+def _headers(scope):
+    headers = {}
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').lower()
+        value = value.decode('latin-1')
+        headers[name] = f'{headers[name]}; {value}' if name == 'cookie' and name in headers else value
+    return headers
+
+def _query(scope):
+    return {name: values[0] for name, values in parse_qs(scope['query_string'].decode('latin-1')).items()}
+
+def _convert(value, default, type_):
+    # Same semantics as request.args.get(name, default, type=...)
+    try:
+        return type_(value) if value is not None else default
+    except (TypeError, ValueError):
+        return default
+
+def _token(headers):
+    """Bearer token, else the instructor/student cookie, as get_token_from_request does"""
+    authorization = headers.get('authorization', '')
+    if authorization.startswith('Bearer '):
+        return authorization.split(' ')[1]
+    try:
+        cookies = SimpleCookie(headers.get('cookie', ''))
+    except CookieError:
+        return None
+    for name in ('instructorToken', 'studentToken'):
+        if name in cookies:
+            return cookies[name].value
+    return None
+
+def _environ(scope, body):
+    """WSGI environ for an ASGI HTTP scope"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+        'wsgi.file_wrapper': _FileWrapper,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name != 'CONTENT_LENGTH':
+            key = f'HTTP_{name}'
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+async def _send_json(send, status, payload):
+    body = json.dumps(payload).encode('utf-8')
+    await send({'type': 'http.response.start', 'status': status, 'headers': [
+        (b'content-type', b'application/json'), (b'content-length', str(len(body)).encode('ascii'))]})
+    await send({'type': 'http.response.body', 'body': body})
+
+async def _wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+class StudyHubASGI:
+    """ASGI application: native coroutines for long-lived routes, the Flask app for the rest"""
+
+    def __init__(self, wsgi_app, threads=ASGI_THREADS):
+        self.wsgi_app = wsgi_app
+        self.threads = threads
+        self.executor = None
+        self.active = 0
+        self.idle = None
+        self.stopping = None
+        self.routes = {
+            '/api/chat/poll': self.chat_poll,
+            '/api/chat/stream': self.chat_stream,
+            '/api/results/export': self.export_results,
+        }
+
+    def _start(self):
+        # Also reached on the first request when the server does not send lifespan events
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='studyhub')
+            self.idle = asyncio.Event()
+            self.idle.set()
+            self.stopping = asyncio.Event()
+
+    async def run_sync(self, func, *args, **kwargs):
+        """Run a blocking call (database, Flask) on the bounded pool"""
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, functools.partial(func, *args, **kwargs))
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            return
+
+        self._start()
+        if self.stopping.is_set():
+            return await _send_json(send, 503, {'success': False, 'message': 'Server is shutting down'})
+        self.active += 1
+        self.idle.clear()
+        try:
+            handler = self.routes.get(scope['path']) if scope['method'] == 'GET' else None
+            await (handler or self.wsgi)(scope, receive, send)
+        finally:
+            self.active -= 1
+            if not self.active:
+                self.idle.set()
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    self._start()
+                    await self.run_sync(init_db)
+                except Exception as e:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def shutdown(self):
+        """Refuse new requests, end chat waits, let other requests finish, then stop the pools and writer"""
+        if self.executor is None:
+            return
+        self.stopping.set()
+        try:
+            await asyncio.wait_for(self.idle.wait(), ASGI_SHUTDOWN_GRACE)
+        except asyncio.TimeoutError:
+            flask_app.logger.warning(f"Shutting down with {self.active} requests still running")
+        await self.run_sync(shutdown_password_pool)
+        await self.run_sync(shutdown_write_queue)
+        executor, self.executor = self.executor, None
+        await asyncio.get_running_loop().run_in_executor(None, executor.shutdown)
+
+    def authenticate(self, scope, allowed_types=None):
+        """(claims, None) for a valid token, else (None, (status, error payload))"""
+        token = _token(_headers(scope))
+        if not token:
+            return None, (401, {'success': False, 'message': 'Authentication required'})
+        try:
+            with flask_app.app_context():
+                claims = decode_token(token)
+        except Exception:
+            return None, (401, {'success': False, 'message': 'Invalid token'})
+        if allowed_types and claims.get('type') not in allowed_types:
+            return None, (401, {'success': False, 'message': 'Invalid token type'})
+        return claims, None
+
+    async def _wait_for_message(self, user, other_user, version, timeout, disconnected):
+        """Until the conversation changes, the timeout passes, the client leaves or shutdown starts"""
+        changed = asyncio.ensure_future(chat_notifier.wait_async(user, other_user, version, timeout))
+        stopping = asyncio.ensure_future(self.stopping.wait())
+        try:
+            await asyncio.wait({changed, stopping, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            changed.cancel()
+            stopping.cancel()
+
+    # Coroutine version of app.chat_poll
+    async def chat_poll(self, scope, receive, send):
+        claims, error = self.authenticate(scope)
+        if error:
+            return await _send_json(send, *error)
+        args = _query(scope)
+        user = claims.get('user')
+        other_user = args.get('other_user')
+        after_id = _convert(args.get('after_id'), 0, int)
+        timeout = min(max(_convert(args.get('timeout'), CHAT_POLL_TIMEOUT, float), 0), CHAT_POLL_TIMEOUT)
+        if not other_user:
+            return await _send_json(send, 400, {'success': False, 'message': 'other_user parameter is required'})
+
+        disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+        try:
+            deadline = time.monotonic() + timeout
+            while True:
+                # Read the version before querying so a message sent in between still wakes us
+                version = chat_notifier.version(user, other_user)
+                messages = await self.run_sync(get_chat_history, user, other_user, after_id=after_id)
+                remaining = deadline - time.monotonic()
+                if disconnected.done():
+                    return
+                if messages or remaining <= 0 or self.stopping.is_set():
+                    return await _send_json(send, 200, {'success': True, 'messages': messages})
+                await self._wait_for_message(user, other_user, version, min(remaining, CHAT_RECHECK_INTERVAL),
+                                             disconnected)
+        except Exception as e:
+            flask_app.logger.error(f"Error polling chat messages: {str(e)}")
+            await _send_json(send, 500, {'success': False, 'message': 'Internal server error'})
+        finally:
+            disconnected.cancel()
+
+    # Coroutine version of app.chat_stream
+    async def chat_stream(self, scope, receive, send):
+        claims, error = self.authenticate(scope)
+        if error:
+            return await _send_json(send, *error)
+        args = _query(scope)
+        user = claims.get('user')
+        other_user = args.get('other_user')
+        if not other_user:
+            return await _send_json(send, 400, {'success': False, 'message': 'other_user parameter is required'})
+        # EventSource resends the last id it saw when it reconnects
+        after_id = _convert(_headers(scope).get('last-event-id'), None, int)
+        if after_id is None:
+            after_id = _convert(args.get('after_id'), 0, int)
+
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ]})
+        disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+        try:
+            await send({'type': 'http.response.body', 'body': b'retry: 3000\n\n', 'more_body': True})
+            last_sent = time.monotonic()
+            while not (disconnected.done() or self.stopping.is_set()):
+                version = chat_notifier.version(user, other_user)
+                events = []
+                for message in await self.run_sync(get_chat_history, user, other_user, after_id=after_id):
+                    after_id = message['id']
+                    events.append(f"id: {message['id']}\ndata: {json.dumps(message)}\n\n")
+                if not events and time.monotonic() - last_sent >= CHAT_KEEPALIVE_INTERVAL:
+                    events.append(': keepalive\n\n')
+                if events:
+                    last_sent = time.monotonic()
+                    await send({'type': 'http.response.body', 'body': ''.join(events).encode('utf-8'),
+                                'more_body': True})
+                await self._wait_for_message(user, other_user, version, CHAT_RECHECK_INTERVAL, disconnected)
+        except Exception as e:
+            flask_app.logger.error(f"Error streaming chat messages: {str(e)}")
+        finally:
+            if not disconnected.done():
+                disconnected.cancel()
+                await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+    # Coroutine version of app.export_results; each batch is fetched and encoded on the pool
+    async def export_results(self, scope, receive, send):
+        _, error = self.authenticate(scope, allowed_types=('instructor',))
+        if error:
+            return await _send_json(send, *error)
+        args = _query(scope)
+        export_format = args.get('format', 'csv').lower()
+        if export_format not in ('csv', 'ndjson'):
+            return await _send_json(send, 400, {'success': False, 'message': 'Format must be csv or ndjson'})
+
+        batches = iter_results_export(args.get('student', ''), args.get('subject', ''),
+                                      args.get('year', ''), args.get('semester', ''))
+        body = encode_export(batches, export_format)
+        filename = f'results.{export_format}'
+        mimetype = 'text/csv; charset=utf-8' if export_format == 'csv' else 'application/x-ndjson'
+        if args.get('gzip') in ('1', 'true'):
+            body = gzip_chunks(body)
+            filename += '.gz'
+            mimetype = 'application/gzip'
+
+        disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+        try:
+            chunk = await self.run_sync(next, body, None)
+            await send({'type': 'http.response.start', 'status': 200, 'headers': [
+                (b'content-type', mimetype.encode('latin-1')),
+                (b'content-disposition', f'attachment; filename={filename}'.encode('latin-1')),
+            ]})
+            while chunk is not None and not disconnected.done():
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                chunk = await self.run_sync(next, body, None)
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        except Exception as e:
+            flask_app.logger.error(f"Error exporting results: {str(e)}")
+        finally:
+            disconnected.cancel()
+            # Closing the generators returns the export's pooled connection
+            await self.run_sync(body.close)
+
+    async def wsgi(self, scope, receive, send):
+        """Serve a request through the Flask app on the pool.
+
+        The whole response runs on one pool thread (Flask's context locals are per thread) and
+        hands chunks to the event loop through a bounded queue; send_file bodies are read here,
+        one block per pool job, so downloads do not hold a thread while the client reads.
+        """
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body += message.get('body', b'')
+            if len(body) > MAX_BODY_SIZE:
+                return await _send_json(send, 413, {'success': False, 'message': 'Request body too large'})
+            if not message.get('more_body'):
+                break
+        environ = _environ(scope, bytes(body))
+
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=RESPONSE_QUEUE_SIZE)
+        cancelled = threading.Event()
+        response = {}
+
+        def put(*item):
+            asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and response.get('sent'):
+                raise exc_info[1].with_traceback(exc_info[2])
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                   for name, value in headers]
+
+        def run():
+            try:
+                result = self.wsgi_app(environ, start_response)
+                if isinstance(result, _FileWrapper):
+                    put('file', result)
+                    return
+                try:
+                    for chunk in result:
+                        if cancelled.is_set():
+                            break
+                        if chunk:
+                            response['sent'] = True
+                            put('body', chunk)
+                finally:
+                    if hasattr(result, 'close'):
+                        result.close()
+                put('end', None)
+            except BaseException as e:
+                put('error', e)
+
+        job = loop.run_in_executor(self.executor, run)
+        started = False
+        try:
+            while True:
+                kind, payload = await queue.get()
+                if kind == 'error':
+                    raise payload
+                if not started:
+                    started = True
+                    await send({'type': 'http.response.start', 'status': response['status'],
+                                'headers': response['headers']})
+                if kind == 'body':
+                    await send({'type': 'http.response.body', 'body': payload, 'more_body': True})
+                elif kind == 'file':
+                    try:
+                        while True:
+                            data = await self.run_sync(payload.file.read, payload.block_size)
+                            if not data:
+                                break
+                            await send({'type': 'http.response.body', 'body': data, 'more_body': True})
+                    finally:
+                        await self.run_sync(payload.close)
+                    await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+                    break
+                else:
+                    await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+                    break
+        except Exception as e:
+            flask_app.logger.error(f"Error serving {scope['path']}: {str(e)}")
+            if not started:
+                await _send_json(send, 500, {'success': False, 'message': 'Internal server error'})
+        finally:
+            # Stop the producer and unblock it if it is waiting on a full queue
+            cancelled.set()
+            while not job.done():
+                try:
+                    await asyncio.wait_for(queue.get(), 0.1)
+                except asyncio.TimeoutError:
+                    pass
+
+application = StudyHubASGI(flask_app)
+
+if __name__ == '__main__':
+    uvicorn = optional_import('uvicorn')
+    if uvicorn is None:
+        raise SystemExit('Install an ASGI server to use this entry point, e.g. pip install uvicorn')
+    uvicorn.run(application, host='0.0.0.0', port=int(os.environ.get('PORT', 8000)), lifespan='on')
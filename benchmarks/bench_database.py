@@ -0,0 +1,255 @@
+# benchmarks/bench_database.py
+"""Latency of the hot database.py read helpers on a seeded database, cold and warm.
+
+Seeds a temporary database at the requested scale (or reuses --database), then times each helper
+on a fresh connection pool (cold: one call per new pool, so SQLite's page and statement caches start
+empty) and on a warmed-up pool (warm). Reports p50/p95/p99 and ops/sec, writes the numbers as JSON
+and, given --baseline, fails when a p50 or p95 got slower than the baseline by more than --threshold.
+
+Usage: python benchmarks/bench_database.py [--students 2000] [--results 40000] [--messages 100000]
+           [--iterations 100] [--output bench_database.json] [--baseline old.json] [--threshold 0.2]
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import sqlite3
+import argparse
+import platform
+import tempfile
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PASSWORD = 'password123'
+SUBJECTS = ('Mathematics', 'Physics', 'Chemistry', 'Biology', 'English', 'History', 'Computer Science', 'Economics')
+YEARS = ('2022', '2023', '2024', '2025')
+SEMESTERS = ('1', '2')
+GRADES = ((80, 'A'), (70, 'B'), (60, 'C'), (50, 'D'), (0, 'F'))
+FIRST_NAMES = ('Amina', 'Brian', 'Chloe', 'David', 'Esther', 'Felix', 'Grace', 'Hassan', 'Irene', 'James')
+LAST_NAMES = ('Otieno', 'Smith', 'Kamau', 'Nguyen', 'Garcia', 'Mwangi', 'Brown', 'Wanjiru', 'Lee', 'Patel')
+
+# Helpers measured, in report order
+HELPERS = ('verify_student', 'get_student_results', 'filter_results_db', 'search_students',
+           'get_chat_history', 'get_all_future_tests')
+
+# Percentiles compared against the baseline
+COMPARED = ('p50_ms', 'p95_ms')
+
+def seed(path, students, instructors, results, messages, future_tests, rng):
+    import database
+    from passwords import hash_password
+    from chat_events import conversation_key
+
+    database.configure_database(path)
+    database.init_db()
+    # Every account shares one hash; hashing is what verify_student measures, not what seeding should
+    hashed = hash_password(PASSWORD)
+    conn = sqlite3.connect(path)
+    try:
+        conn.executemany(
+            'INSERT INTO students (username, fullname, email, password) VALUES (?, ?, ?, ?)',
+            ((f'student{i}', f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}',
+              f'student{i}@example.com', hashed) for i in range(1, students + 1)))
+        conn.executemany(
+            'INSERT INTO instructors (username, fullname, email, password, subject) VALUES (?, ?, ?, ?, ?)',
+            ((f'instructor{i}', f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+              f'instructor{i}@example.com', hashed, SUBJECTS[i % len(SUBJECTS)]) for i in range(1, instructors + 1)))
+
+        def result_rows():
+            for _ in range(results):
+                marks = rng.randint(20, 100)
+                grade = next(letter for floor, letter in GRADES if marks >= floor)
+                yield (rng.randint(1, students), rng.choice(SUBJECTS), marks, grade, rng.choice((2, 3, 4)),
+                       rng.choice(SEMESTERS), rng.choice(YEARS))
+        conn.executemany('''
+            INSERT INTO results (student_id, subject, marks, grade, credits, semester, academic_year)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', result_rows())
+
+        def message_rows():
+            for i in range(messages):
+                sender = f'student{rng.randint(1, students)}'
+                receiver = f'instructor{rng.randint(1, instructors)}'
+                if i % 2:
+                    sender, receiver = receiver, sender
+                yield sender, receiver, f'Message {i} about {rng.choice(SUBJECTS)}', conversation_key(sender, receiver)
+        conn.executemany('INSERT INTO messages (sender, receiver, message, conversation) VALUES (?, ?, ?, ?)',
+                         message_rows())
+
+        conn.executemany('''
+            INSERT INTO future_tests (subject, test_date, test_time, duration, location, test_type, description, instructor_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', ((rng.choice(SUBJECTS), f'2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+               f'{rng.randint(8, 16):02d}:00', '2 hours', f'Room {rng.randint(1, 40)}', 'Exam', 'Seeded test',
+               rng.randint(1, instructors)) for _ in range(future_tests)))
+        conn.commit()
+        conn.execute('ANALYZE')
+    finally:
+        conn.close()
+
+def scale_of(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                for table in ('students', 'instructors', 'results', 'messages', 'future_tests')}
+    finally:
+        conn.close()
+
+def call_factories(scale, rng):
+    """helper name -> function drawing fresh arguments and calling the helper once"""
+    import database
+    students = max(scale['students'], 1)
+    instructors = max(scale['instructors'], 1)
+    return {
+        'verify_student': lambda: database.verify_student(f'student{rng.randint(1, students)}', PASSWORD),
+        'get_student_results': lambda: database.get_student_results(
+            rng.randint(1, students), rng.choice(YEARS), rng.choice(SEMESTERS)),
+        'filter_results_db': lambda: database.filter_results_db(
+            '', rng.choice(SUBJECTS), rng.choice(YEARS), rng.choice(SEMESTERS)),
+        'search_students': lambda: database.search_students(
+            rng.choice((str(rng.randint(1, students)), rng.choice(LAST_NAMES), f'student{rng.randint(1, students)}'))),
+        'get_chat_history': lambda: database.get_chat_history(
+            f'student{rng.randint(1, students)}', f'instructor{rng.randint(1, instructors)}'),
+        'get_all_future_tests': database.get_all_future_tests,
+    }
+
+def summarize(samples):
+    samples = sorted(samples)
+    def percentile(fraction):
+        return round(samples[int(fraction * (len(samples) - 1))] * 1000, 3)
+    return {
+        'runs': len(samples),
+        'p50_ms': percentile(0.50),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+        'ops_per_sec': round(len(samples) / sum(samples), 1) if sum(samples) else None,
+    }
+
+def time_calls(call, runs, before=None):
+    samples = []
+    for _ in range(runs):
+        if before:
+            before()
+        started = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+def run(path, scale, iterations, cold_runs, warmup, rng):
+    import database
+
+    def reset_pool():
+        # New pool: new connections with empty page and statement caches, table versions re-read
+        database.configure_database(path)
+
+    results = {}
+    calls = call_factories(scale, rng)
+    # The helpers log every login attempt; keep that out of the terminal (it still costs what it costs)
+    with contextlib.redirect_stdout(io.StringIO()) as sink:
+        for name in HELPERS:
+            call = calls[name]
+            cold = time_calls(call, cold_runs, before=reset_pool)
+            time_calls(call, warmup)
+            warm = time_calls(call, iterations)
+            results[name] = {'cold': summarize(cold), 'warm': summarize(warm)}
+            sink.seek(0)
+            sink.truncate()
+    return results
+
+def report(results):
+    print(f'{"helper":<22} {"phase":<5} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"ops/sec":>10}')
+    for name, phases in results.items():
+        for phase, stats in phases.items():
+            print(f'{name:<22} {phase:<5} {stats["p50_ms"]:9.3f} {stats["p95_ms"]:9.3f} '
+                  f'{stats["p99_ms"]:9.3f} {stats["ops_per_sec"] or 0:10.1f}')
+
+def compare(results, baseline, threshold):
+    """Lines describing every compared percentile that is more than `threshold` slower than baseline"""
+    regressions = []
+    for name, phases in results.items():
+        for phase, stats in phases.items():
+            previous = baseline.get(name, {}).get(phase)
+            if not previous:
+                continue
+            for key in COMPARED:
+                if previous.get(key) and stats[key] > previous[key] * (1 + threshold):
+                    change = stats[key] / previous[key] - 1
+                    regressions.append(f'{name} {phase} {key}: {previous[key]:.3f} -> {stats[key]:.3f} (+{change:.0%})')
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--instructors', type=int, default=50)
+    parser.add_argument('--results', type=int, default=40000)
+    parser.add_argument('--messages', type=int, default=100000)
+    parser.add_argument('--future-tests', type=int, default=500)
+    parser.add_argument('--iterations', type=int, default=100, help='warm calls timed per helper')
+    parser.add_argument('--cold-runs', type=int, default=20, help='cold calls timed per helper, each on a new pool')
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--database', help='reuse (or seed once into) this file instead of a temporary one')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--baseline', help='JSON written by an earlier --output run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown, as a fraction')
+    args = parser.parse_args()
+    # Relative paths mean the directory the script was started from, not the work directory
+    for option in ('database', 'output', 'baseline'):
+        if getattr(args, option):
+            setattr(args, option, os.path.abspath(getattr(args, option)))
+
+    workdir = tempfile.mkdtemp(prefix='studyhub-bench-')
+    os.chdir(workdir)
+    try:
+        import database
+        import passwords
+
+        rng = random.Random(args.seed)
+        path = args.database or os.path.join(workdir, 'bench.db')
+        if not os.path.exists(path):
+            started = time.perf_counter()
+            seed(path, args.students, args.instructors, args.results, args.messages, args.future_tests, rng)
+            print(f'seeded {path} in {time.perf_counter() - started:.1f} s')
+        scale = scale_of(path)
+        print('scale: ' + ', '.join(f'{table} {count}' for table, count in scale.items()))
+
+        results = run(path, scale, args.iterations, args.cold_runs, args.warmup, rng)
+        database.shutdown_write_queue()
+        passwords.shutdown_password_pool()
+        report(results)
+
+        document = {
+            'meta': {
+                'scale': scale,
+                'iterations': args.iterations,
+                'cold_runs': args.cold_runs,
+                'python': platform.python_version(),
+                'sqlite': sqlite3.sqlite_version,
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            },
+            'results': results,
+        }
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(document, f, indent=2)
+
+        if args.baseline:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+            if baseline.get('meta', {}).get('scale') != scale:
+                print('warning: baseline was measured at a different scale')
+            regressions = compare(results, baseline.get('results', {}), args.threshold)
+            for line in regressions:
+                print(f'REGRESSION {line}')
+            if regressions:
+                sys.exit(1)
+            print(f'no regressions beyond {args.threshold:.0%}')
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
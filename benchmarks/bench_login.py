@@ -0,0 +1,63 @@
+# benchmarks/bench_login.py
+"""Login throughput with password hashing inline vs. on the worker pool.
+
+Usage: python benchmarks/bench_login.py [--users 20] [--requests 200] [--threads 8] [--workers 4]
+"""
+import os
+import sys
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def run(client, users, requests_count, threads):
+    def login(i):
+        username = f'bench_student{i % users}'
+        response = client.post('/api/student/login', json={'username': username, 'password': 'password123'})
+        return response.status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        statuses = list(pool.map(login, range(requests_count)))
+    elapsed = time.perf_counter() - started
+    failures = sum(1 for status in statuses if status != 200)
+    return requests_count / elapsed, failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='studyhub-bench-')
+    os.chdir(workdir)
+    try:
+        import database
+        import passwords
+        from app import app
+        logging.disable(logging.CRITICAL)
+
+        database.configure_database(os.path.join(workdir, 'bench.db'))
+        database.init_db()
+        for i in range(args.users):
+            database.add_student(f'bench_student{i}', 'password123', f'Bench Student {i}', f'bench{i}@example.com')
+
+        client = app.test_client()
+        for label, workers in (('inline', 0), (f'pool ({args.workers} workers)', args.workers)):
+            passwords.configure_password_hashing(workers=workers)
+            # Warm up so pool start-up is not counted
+            run(client, args.users, args.threads, args.threads)
+            rate, failures = run(client, args.users, args.requests, args.threads)
+            print(f'{label:<24} {rate:8.1f} logins/sec  ({failures} failed)')
+        passwords.shutdown_password_pool()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
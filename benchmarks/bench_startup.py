@@ -0,0 +1,66 @@
+# benchmarks/bench_startup.py
+"""Startup latency: interpreter start, `import app`, and the first request, each in a fresh process.
+
+The first run starts from an empty directory (schema created and migrated); the rest reuse the
+stamped database, which is what every worker boot after a deploy sees.
+
+Usage: python benchmarks/bench_startup.py [--runs 10]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside each child process; prints its timings as JSON on the last line of stdout
+CHILD = '''
+import sys, time, json, logging
+started = time.perf_counter()
+sys.path.insert(0, {root!r})
+import app
+imported = time.perf_counter()
+logging.disable(logging.CRITICAL)
+response = app.app.test_client().get('/')
+finished = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(json.dumps({{'import': imported - started, 'first_request': finished - imported}}))
+'''
+
+def run_once(workdir):
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, '-c', CHILD.format(root=ROOT)],
+        cwd=workdir, capture_output=True, text=True, check=True
+    )
+    timings = json.loads(completed.stdout.strip().splitlines()[-1])
+    timings['process'] = time.perf_counter() - started
+    return timings
+
+def summarize(label, runs):
+    print(f'{label}')
+    for key in ('import', 'first_request', 'process'):
+        values = [run[key] * 1000 for run in runs]
+        print(f'  {key:<14} median {statistics.median(values):8.1f} ms   min {min(values):8.1f} ms')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='studyhub-startup-')
+    try:
+        cold = run_once(workdir)
+        warm = [run_once(workdir) for _ in range(args.runs)]
+        summarize('fresh database (1 run)', [cold])
+        summarize(f'current schema ({args.runs} runs)', warm)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,258 @@
+# calculator.py
+import ast
+import math
+from functools import lru_cache
+from utils import optional_import
+
+# Limits that keep a single expression cheap to compile and evaluate
+MAX_EXPRESSION_LENGTH = 1000
+MAX_EXPRESSION_NODES = 250
+MAX_FACTORIAL = 170
+DEFAULT_PRECISION = 14
+MAX_PRECISION = 17
+MAX_SAMPLE_POINTS = 100000
+
+class ExpressionError(ValueError):
+    """Raised for expressions that are malformed, not allowed, or cannot be evaluated"""
+
+def _factorial(n):
+    if n != int(n) or n < 0:
+        raise ExpressionError('factorial is only defined for non-negative integers')
+    if n > MAX_FACTORIAL:
+        raise ExpressionError('Result too large')
+    return float(math.factorial(int(n)))
+
+def _round(x, ndigits=0):
+    return float(round(x, int(ndigits)))
+
+def _log(x, base=None):
+    # Natural log by default, as on the calculator page; log(x, b) for other bases
+    return math.log(x) if base is None else math.log(x, base)
+
+# Everything an expression may call; all arithmetic is done in floats so no operation can grow unbounded,
+# which is why floor, ceil and round convert their (otherwise int) results back to float
+FUNCTIONS = {
+    'sin': math.sin, 'cos': math.cos, 'tan': math.tan,
+    'asin': math.asin, 'acos': math.acos, 'atan': math.atan, 'atan2': math.atan2,
+    'sinh': math.sinh, 'cosh': math.cosh, 'tanh': math.tanh,
+    'asinh': math.asinh, 'acosh': math.acosh, 'atanh': math.atanh,
+    'sec': lambda x: 1 / math.cos(x), 'csc': lambda x: 1 / math.sin(x), 'cot': lambda x: 1 / math.tan(x),
+    'sqrt': math.sqrt, 'cbrt': lambda x: math.copysign(abs(x) ** (1 / 3), x),
+    'exp': math.exp, 'log': _log, 'ln': math.log, 'log10': math.log10, 'log2': math.log2,
+    'abs': abs, 'floor': lambda x: float(math.floor(x)), 'ceil': lambda x: float(math.ceil(x)), 'round': _round,
+    'min': min, 'max': max, 'hypot': math.hypot, 'pow': math.pow,
+    'factorial': _factorial, 'degrees': math.degrees, 'radians': math.radians,
+}
+
+CONSTANTS = {
+    'pi': math.pi, 'PI': math.pi, 'e': math.e, 'E': math.e, 'tau': math.tau,
+    'phi': (1 + math.sqrt(5)) / 2, 'inf': math.inf, 'Infinity': math.inf,
+}
+
+_BINARY_OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.Mod, ast.FloorDiv)
+_UNARY_OPERATORS = (ast.UAdd, ast.USub)
+
+class _Validator(ast.NodeTransformer):
+    """Reject any node outside the arithmetic whitelist and turn integer literals into floats"""
+
+    def __init__(self, variables):
+        self.variables = variables
+        self.nodes = 0
+        self.functions = set()
+
+    def visit(self, node):
+        self.nodes += 1
+        if self.nodes > MAX_EXPRESSION_NODES:
+            raise ExpressionError('Expression is too complex')
+        return super().visit(node)
+
+    def generic_visit(self, node):
+        raise ExpressionError(f'Unsupported syntax: {type(node).__name__}')
+
+    def visit_Expression(self, node):
+        node.body = self.visit(node.body)
+        return node
+
+    def visit_BinOp(self, node):
+        if not isinstance(node.op, _BINARY_OPERATORS):
+            raise ExpressionError(f'Unsupported operator: {type(node.op).__name__}')
+        node.left = self.visit(node.left)
+        node.right = self.visit(node.right)
+        return node
+
+    def visit_UnaryOp(self, node):
+        if not isinstance(node.op, _UNARY_OPERATORS):
+            raise ExpressionError(f'Unsupported operator: {type(node.op).__name__}')
+        node.operand = self.visit(node.operand)
+        return node
+
+    def visit_Constant(self, node):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            raise ExpressionError('Only numbers are allowed')
+        return ast.copy_location(ast.Constant(float(node.value)), node)
+
+    def visit_Name(self, node):
+        if node.id not in CONSTANTS and node.id not in self.variables:
+            raise ExpressionError(f'Unknown name: {node.id}')
+        return node
+
+    def visit_Call(self, node):
+        if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS:
+            raise ExpressionError('Unknown function')
+        if node.keywords or any(isinstance(arg, ast.Starred) for arg in node.args):
+            raise ExpressionError('Only positional arguments are allowed')
+        self.functions.add(node.func.id)
+        node.args = [self.visit(arg) for arg in node.args]
+        return node
+
+class CompiledExpression:
+    """A validated expression compiled to a code object, evaluated against a fixed namespace"""
+
+    def __init__(self, source, variables, tree, functions):
+        self.source = source
+        self.variables = variables
+        self.functions = frozenset(functions)
+        self.code = compile(tree, '<expression>', 'eval')
+        # The same body wrapped as "lambda <variables>: ...", bound to a namespace by as_function
+        arguments = ast.arguments(posonlyargs=[], args=[ast.arg(name) for name in variables],
+                                  kwonlyargs=[], kw_defaults=[], defaults=[])
+        function_tree = ast.fix_missing_locations(ast.Expression(ast.Lambda(arguments, tree.body)))
+        self.function_code = compile(function_tree, '<expression>', 'eval')
+
+    def as_function(self, namespace=None):
+        """A plain Python function of the expression's variables, resolving names in `namespace`"""
+        return eval(self.function_code, {'__builtins__': {}, **(namespace or _NAMESPACE)})
+
+    def evaluate(self, namespace=None, **values):
+        """Evaluate with the given variable values; math errors become ExpressionError"""
+        scope = dict(namespace or _NAMESPACE)
+        scope.update(values)
+        try:
+            return eval(self.code, {'__builtins__': {}}, scope)
+        except ZeroDivisionError:
+            raise ExpressionError('Division by zero')
+        except OverflowError:
+            raise ExpressionError('Result too large')
+        except (ValueError, TypeError) as e:
+            if isinstance(e, ExpressionError):
+                raise
+            raise ExpressionError(f'Math error: {e}')
+
+_NAMESPACE = {**FUNCTIONS, **CONSTANTS}
+
+@lru_cache(maxsize=1024)
+def compile_expression(source, variables=()):
+    """Parse, validate and compile an expression; repeated expressions come from an LRU"""
+    if len(source) > MAX_EXPRESSION_LENGTH:
+        raise ExpressionError('Expression is too long')
+    # "^" is the usual power operator on the calculator page; Python would read it as xor
+    text = source.replace('^', '**').strip()
+    if not text:
+        raise ExpressionError('Expression is empty')
+    try:
+        tree = ast.parse(text, mode='eval')
+    except (SyntaxError, ValueError, RecursionError, MemoryError):
+        raise ExpressionError('Invalid expression')
+    validator = _Validator(frozenset(variables))
+    tree = ast.fix_missing_locations(validator.visit(tree))
+    return CompiledExpression(source, variables, tree, validator.functions)
+
+def format_number(value, precision=DEFAULT_PRECISION):
+    """Render a result with `precision` significant digits, dropping trailing zeros"""
+    if math.isinf(value) or math.isnan(value):
+        return str(value)
+    text = format(value, f'.{precision}g')
+    return '0' if text == '-0' else text
+
+def calculate(source, precision=DEFAULT_PRECISION):
+    """Evaluate an expression; returns (value, formatted result), value is None when not finite"""
+    precision = min(max(int(precision), 1), MAX_PRECISION)
+    value = compile_expression(source).evaluate()
+    if isinstance(value, complex):
+        raise ExpressionError('Result is not a real number')
+    try:
+        value = float(value)
+    except OverflowError:
+        raise ExpressionError('Result too large')
+    return (value if math.isfinite(value) else None), format_number(value, precision)
+
+# Element-wise equivalents of FUNCTIONS; expressions using anything else are sampled point by point
+NUMPY_FUNCTIONS = {
+    'sin': 'sin', 'cos': 'cos', 'tan': 'tan', 'asin': 'arcsin', 'acos': 'arccos', 'atan': 'arctan',
+    'atan2': 'arctan2', 'sinh': 'sinh', 'cosh': 'cosh', 'tanh': 'tanh', 'asinh': 'arcsinh',
+    'acosh': 'arccosh', 'atanh': 'arctanh', 'sqrt': 'sqrt', 'cbrt': 'cbrt', 'exp': 'exp',
+    'ln': 'log', 'log10': 'log10', 'log2': 'log2', 'abs': 'abs', 'floor': 'floor', 'ceil': 'ceil',
+    'round': 'round', 'min': 'minimum', 'max': 'maximum', 'hypot': 'hypot', 'pow': 'power',
+    'degrees': 'degrees', 'radians': 'radians',
+}
+VECTORIZED_FUNCTIONS = frozenset(NUMPY_FUNCTIONS) | {'sec', 'csc', 'cot', 'log'}
+
+_numpy_namespace = None
+
+def _get_numpy_namespace(np):
+    global _numpy_namespace
+    if _numpy_namespace is None:
+        def log(x, base=None):
+            return np.log(x) if base is None else np.log(x) / np.log(base)
+
+        namespace = {name: getattr(np, attr) for name, attr in NUMPY_FUNCTIONS.items()}
+        namespace.update(sec=lambda x: 1 / np.cos(x), csc=lambda x: 1 / np.sin(x),
+                         cot=lambda x: 1 / np.tan(x), log=log)
+        _numpy_namespace = {**namespace, **CONSTANTS}
+    return _numpy_namespace
+
+def sample_points(start, stop, count):
+    """`count` evenly spaced points from start to stop inclusive"""
+    count = int(count)
+    if not 1 <= count <= MAX_SAMPLE_POINTS:
+        raise ExpressionError(f'Number of points must be between 1 and {MAX_SAMPLE_POINTS}')
+    start, stop = float(start), float(stop)
+    if not (math.isfinite(start) and math.isfinite(stop)):
+        raise ExpressionError('Range must be finite')
+    if count == 1:
+        return [start]
+    step = (stop - start) / (count - 1)
+    return [start + i * step for i in range(count)]
+
+def _sample_python(expression, xs):
+    function = expression.as_function()
+    ys = []
+    for x in xs:
+        try:
+            y = function(x)
+        except (ArithmeticError, ValueError, TypeError):
+            y = None
+        if isinstance(y, complex) or (y is not None and not math.isfinite(y)):
+            y = None
+        ys.append(y if y is None else float(y))
+    return ys
+
+def _sample_numpy(np, expression, xs):
+    x = np.asarray(xs, dtype=np.float64)
+    with np.errstate(all='ignore'):
+        y = np.broadcast_to(np.asarray(expression.as_function(_get_numpy_namespace(np))(x), dtype=np.float64),
+                            x.shape)
+    # Points outside the domain (nan) or overflowing (inf) are returned as null, as in the Python path
+    return np.where(np.isfinite(y), y, None).tolist()
+
+def sample_expression(source, xs):
+    """Evaluate an expression in x at every point of xs; undefined points come back as None.
+
+    The expression is compiled once; with NumPy all points are evaluated as one array operation,
+    otherwise (or for functions without an element-wise equivalent) through a compiled lambda.
+    """
+    if len(xs) > MAX_SAMPLE_POINTS:
+        raise ExpressionError(f'At most {MAX_SAMPLE_POINTS} points can be sampled at once')
+    expression = compile_expression(source, ('x',))
+    # NumPy is optional; without it points run one by one through the compiled lambda
+    np = optional_import('numpy')
+    if np is not None and expression.functions <= VECTORIZED_FUNCTIONS:
+        try:
+            return _sample_numpy(np, expression, xs)
+        except (ArithmeticError, ValueError, TypeError):
+            pass
+    return _sample_python(expression, xs)
+
+def get_calculator_cache_stats():
+    """Hit/miss counters of the compiled-expression LRU"""
+    return compile_expression.cache_info()._asdict()
@@ -0,0 +1,85 @@
+# chat_events.py
+import asyncio
+import threading
+
+def conversation_key(user1, user2):
+    """Order-independent key identifying the conversation between two users"""
+    return '\x1f'.join(sorted((user1, user2)))
+
+class ConversationNotifier:
+    """Wakes requests waiting on a conversation when a new message is sent to it"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = {}
+        self._conditions = {}
+        self._waiters = {}
+        # Coroutines waiting under the ASGI server: key -> set of (event loop, future)
+        self._async_waiters = {}
+
+    def version(self, user1, user2):
+        """Current change counter of a conversation; pass it to wait()"""
+        return self._versions.get(conversation_key(user1, user2), 0)
+
+    def notify(self, user1, user2):
+        """Record a new message and wake everyone waiting on the conversation"""
+        key = conversation_key(user1, user2)
+        with self._lock:
+            self._versions[key] = self._versions.get(key, 0) + 1
+            condition = self._conditions.get(key)
+            if condition is not None:
+                condition.notify_all()
+            # notify() runs on whatever thread committed the message, so wake loops thread-safely
+            for loop, future in self._async_waiters.get(key, ()):
+                loop.call_soon_threadsafe(_resolve, future)
+
+    def wait(self, user1, user2, version, timeout):
+        """Block until the conversation moves past version or timeout passes; True if it changed"""
+        key = conversation_key(user1, user2)
+        with self._lock:
+            condition = self._conditions.get(key)
+            if condition is None:
+                condition = self._conditions[key] = threading.Condition(self._lock)
+            self._waiters[key] = self._waiters.get(key, 0) + 1
+            try:
+                return condition.wait_for(lambda: self._versions.get(key, 0) != version, timeout)
+            finally:
+                # Drop the condition once nobody waits on it so idle conversations cost nothing
+                self._waiters[key] -= 1
+                if not self._waiters[key]:
+                    del self._waiters[key]
+                    del self._conditions[key]
+
+    async def wait_async(self, user1, user2, version, timeout):
+        """Coroutine form of wait(): suspends without holding a thread; True if it changed"""
+        key = conversation_key(user1, user2)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        entry = (loop, future)
+        with self._lock:
+            if self._versions.get(key, 0) != version:
+                return True
+            self._async_waiters.setdefault(key, set()).add(entry)
+        try:
+            await asyncio.wait_for(future, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._lock:
+                waiters = self._async_waiters[key]
+                waiters.discard(entry)
+                if not waiters:
+                    del self._async_waiters[key]
+
+    def waiting(self):
+        """Number of requests currently waiting on any conversation"""
+        with self._lock:
+            return sum(self._waiters.values()) + sum(len(waiters) for waiters in self._async_waiters.values())
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(True)
+
+# Shared by database.send_message and the chat endpoints
+chat_notifier = ConversationNotifier()
@@ -0,0 +1,123 @@
+# compression.py
+import zlib
+import threading
+
+# Content types worth compressing; PDFs, images and already-gzipped exports are left alone
+COMPRESSIBLE_TYPES = (
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript',
+    'application/json', 'application/javascript', 'application/x-ndjson',
+)
+
+class CompressionMiddleware:
+    """WSGI middleware that gzip/deflate-encodes responses when the client accepts it"""
+
+    def __init__(self, app, min_size=1024, level=6):
+        self.app = app
+        self.min_size = min_size
+        self.level = level
+        self._lock = threading.Lock()
+        self._stats = {'compressed': 0, 'skipped': 0, 'bytes_in': 0, 'bytes_out': 0}
+
+    def stats(self):
+        """Counters of compressed responses and bytes saved"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['bytes_saved'] = stats['bytes_in'] - stats['bytes_out']
+        return stats
+
+    @staticmethod
+    def negotiate(accept_encoding):
+        """Pick gzip or deflate from an Accept-Encoding header, honouring q-values"""
+        best, best_q = None, 0.0
+        for part in accept_encoding.split(','):
+            name, _, params = part.strip().partition(';')
+            name = name.strip().lower()
+            q = 1.0
+            params = params.strip()
+            if params.startswith('q='):
+                try:
+                    q = float(params[2:])
+                except ValueError:
+                    q = 0.0
+            if name in ('gzip', 'deflate') and q > best_q:
+                best, best_q = name, q
+        return best
+
+    @staticmethod
+    def _compressible(headers):
+        """True for responses whose encoding depends on Accept-Encoding (compressed or not this time)"""
+        values = {key.lower(): value for key, value in headers}
+        if 'content-encoding' in values or 'content-range' in values:
+            return False
+        return values.get('content-type', '').split(';')[0].strip().lower() in COMPRESSIBLE_TYPES
+
+    def _should_compress(self, status, headers):
+        if not status.startswith('200') or not self._compressible(headers):
+            return False
+        length = next((value for key, value in headers if key.lower() == 'content-length'), None)
+        return length is None or int(length) >= self.min_size
+
+    @staticmethod
+    def _add_vary(headers):
+        # Shared caches must not hand an identity body to gzip clients, or the reverse
+        for index, (key, value) in enumerate(headers):
+            if key.lower() == 'vary':
+                fields = [field.strip().lower() for field in value.split(',')]
+                if 'accept-encoding' not in fields and '*' not in fields:
+                    headers[index] = (key, value + ', Accept-Encoding')
+                return headers
+        headers.append(('Vary', 'Accept-Encoding'))
+        return headers
+
+    def __call__(self, environ, start_response):
+        encoding = self.negotiate(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        if environ.get('REQUEST_METHOD') == 'HEAD':
+            encoding = None
+
+        state = {'compress': False, 'streamed': False}
+
+        def compressing_start_response(status, headers, exc_info=None):
+            headers = list(headers)
+            if self._compressible(headers):
+                headers = self._add_vary(headers)
+            if encoding and self._should_compress(status, headers):
+                state['compress'] = True
+                state['streamed'] = not any(key.lower() == 'content-length' for key, _ in headers)
+                headers = [(key, value) for key, value in headers if key.lower() != 'content-length']
+                # The encoded bytes differ from the identity body, so a strong ETag becomes weak
+                headers = [(key, 'W/' + value if key.lower() == 'etag' and not value.startswith('W/') else value)
+                           for key, value in headers]
+                headers.append(('Content-Encoding', encoding))
+            return start_response(status, headers, exc_info)
+
+        app_iter = self.app(environ, compressing_start_response)
+        if not state['compress']:
+            with self._lock:
+                self._stats['skipped'] += 1
+            return app_iter
+        return self._compress(app_iter, encoding, state['streamed'])
+
+    def _compress(self, app_iter, encoding, streamed):
+        # gzip wraps the stream in a gzip header; HTTP "deflate" means the zlib format
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31 if encoding == 'gzip' else 15)
+        bytes_in = bytes_out = 0
+        try:
+            for chunk in app_iter:
+                bytes_in += len(chunk)
+                data = compressor.compress(chunk)
+                # Streamed bodies are flushed per chunk so clients see data as it is produced
+                if streamed:
+                    data += compressor.flush(zlib.Z_SYNC_FLUSH)
+                if data:
+                    bytes_out += len(data)
+                    yield data
+            data = compressor.flush()
+            bytes_out += len(data)
+            yield data
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+            with self._lock:
+                self._stats['compressed'] += 1
+                self._stats['bytes_in'] += bytes_in
+                self._stats['bytes_out'] += bytes_out
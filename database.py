@@ -1,10 +1,376 @@
 # Import required modules
 import sqlite3
-from werkzeug.security import generate_password_hash, check_password_hash
+import threading
+import time
+import json
+import base64
+from queue import LifoQueue, Empty, Full
+from flask import g, has_app_context
+from passwords import hash_password, check_password, needs_rehash
+from chat_events import chat_notifier, conversation_key
+from write_queue import WriteQueue
 
-# Initialize the database and create required tables
-def init_db():
-    conn = sqlite3.connect('study_hub.db')
+# Path of the SQLite database file shared by every helper
+DATABASE = 'study_hub.db'
+
+# Pragmas applied once to every pooled connection
+CONNECTION_PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA busy_timeout = 5000',
+    'PRAGMA foreign_keys = ON',
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA mmap_size = 268435456',
+    'PRAGMA cache_size = -16000',
+)
+
+# Pool of pre-configured SQLite connections reused across requests and threads
+class ConnectionPool:
+    def __init__(self, database, max_size=8, cached_statements=256):
+        self.database = database
+        self.max_size = max_size
+        self.cached_statements = cached_statements
+        self._idle = LifoQueue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self._stats = {'created': 0, 'reused': 0, 'checkouts': 0, 'in_use': 0, 'discarded': 0}
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.database,
+            timeout=5.0,
+            check_same_thread=False,
+            cached_statements=self.cached_statements
+        )
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        # Load the schema now so the first real query does not pay for parsing it
+        conn.execute('SELECT name FROM sqlite_master').fetchall()
+        return conn
+
+    def acquire(self):
+        try:
+            conn = self._idle.get_nowait()
+            reused = True
+        except Empty:
+            conn = self._connect()
+            reused = False
+        with self._lock:
+            self._stats['checkouts'] += 1
+            self._stats['in_use'] += 1
+            self._stats['reused' if reused else 'created'] += 1
+        return conn
+
+    def release(self, conn):
+        # Never hand a connection with an open transaction to the next caller
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            self._stats['in_use'] -= 1
+        try:
+            self._idle.put_nowait(conn)
+        except Full:
+            conn.close()
+            with self._lock:
+                self._stats['discarded'] += 1
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except Empty:
+                break
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['idle'] = self._idle.qsize()
+        stats['max_size'] = self.max_size
+        return stats
+
+_pool = ConnectionPool(DATABASE)
+
+# Single writer that group-commits messages, results, evaluations and future tests
+_writer = WriteQueue(_pool._connect)
+
+# Seconds a caller waits for its queued write before giving up
+WRITE_TIMEOUT = 30
+
+# Point the pool at a different database file (used by scripts and benchmarks)
+def configure_database(database, max_size=8):
+    global DATABASE, _pool, _writer
+    _writer.close()
+    _pool.close_all()
+    DATABASE = database
+    _pool = ConnectionPool(database, max_size=max_size)
+    _writer = WriteQueue(_pool._connect)
+    bump_table_version(None)
+
+# Get a pooled connection; inside a Flask app context one connection serves the whole request
+def get_connection():
+    if has_app_context():
+        if 'db_conn' not in g:
+            g.db_conn = _pool.acquire()
+        return g.db_conn
+    return _pool.acquire()
+
+# Hand a connection back once a helper is done with it
+def release_connection(conn):
+    if has_app_context() and g.get('db_conn') is conn:
+        # Kept until teardown, but never left holding a transaction
+        if conn.in_transaction:
+            conn.rollback()
+        return
+    _pool.release(conn)
+
+# Return the request's connection to the pool (registered as an app teardown handler)
+def close_db(exception=None):
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        _pool.release(conn)
+
+# Get connection pool statistics
+def get_pool_stats():
+    return _pool.stats()
+
+# Get write queue depth, batch sizes and commit latency
+def get_write_queue_stats():
+    return _writer.stats()
+
+# Commit whatever is still queued and stop the writer thread
+def shutdown_write_queue():
+    _writer.close()
+
+# Tables whose writes are counted in table_versions (maintained by triggers, see migration 5;
+# resources got its triggers with its table in migration 7)
+VERSIONED_TABLES = ('students', 'instructors', 'results', 'future_tests', 'evaluations')
+
+# Per-table write counters; caches compare them to know when their data went stale.
+# They live in the database so every worker process sees the same values, and are
+# re-read at most once per TABLE_VERSION_REFRESH seconds unless this process wrote.
+TABLE_VERSION_REFRESH = 1.0
+_table_versions = {}
+_versions_loaded_at = 0.0
+_versions_lock = threading.Lock()
+
+# Statements creating the write-counting triggers of one table
+def table_version_triggers(table):
+    return [
+        f'''CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()} AFTER {event} ON {table} BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = '{table}';
+        END'''
+        for event in ('INSERT', 'UPDATE', 'DELETE')
+    ] + [f"INSERT OR IGNORE INTO table_versions (name, version) VALUES ('{table}', 0)"]
+
+# Record that a table changed so the next read picks up the new counters
+def bump_table_version(table):
+    global _versions_loaded_at
+    with _versions_lock:
+        _versions_loaded_at = 0.0
+
+# Current write counter of a table
+def get_table_version(table):
+    global _table_versions, _versions_loaded_at
+    if time.monotonic() - _versions_loaded_at > TABLE_VERSION_REFRESH:
+        conn = get_connection()
+        try:
+            versions = dict(conn.execute('SELECT name, version FROM table_versions').fetchall())
+        except sqlite3.OperationalError:
+            # Database not migrated yet
+            versions = {}
+        finally:
+            release_connection(conn)
+        with _versions_lock:
+            _table_versions = versions
+            _versions_loaded_at = time.monotonic()
+    return _table_versions.get(table, 0)
+
+# Academic term an evaluation belongs to, from its timestamp: "YYYY-1" (Jan-Jun) or "YYYY-2" (Jul-Dec)
+EVALUATION_TERM_SQL = (
+    "strftime('%Y', created_at) || '-' || "
+    "CASE WHEN CAST(strftime('%m', created_at) AS INTEGER) <= 6 THEN '1' ELSE '2' END"
+)
+
+# Numbered schema migrations; each one is applied once and recorded in PRAGMA user_version
+MIGRATIONS = [
+    (1, [
+        # get_student_results: equality on student/year/semester, ordered by subject, covering the selected columns
+        '''CREATE INDEX IF NOT EXISTS idx_results_student_term
+           ON results (student_id, academic_year, semester, subject, marks, grade, credits)''',
+        # get_chat_history: both directions of a conversation ordered by time
+        '''CREATE INDEX IF NOT EXISTS idx_messages_pair_time
+           ON messages (sender, receiver, timestamp)''',
+        # get_future_tests_by_instructor: instructor filter ordered by date and time
+        '''CREATE INDEX IF NOT EXISTS idx_future_tests_instructor_date
+           ON future_tests (instructor_id, test_date, test_time)''',
+        # get_instructor_evaluations: instructor filter ordered by newest first
+        '''CREATE INDEX IF NOT EXISTS idx_evaluations_instructor_created
+           ON evaluations (instructor_id, created_at)''',
+    ]),
+    (2, [
+        # search_students: trigram full-text index over the searchable student columns
+        lambda conn: create_student_search_index(conn),
+    ]),
+    (3, [
+        # Keyset pagination of results: walk students by name, then each student's results in sort order
+        # (idx_results_student_term already has the per-student order)
+        'CREATE INDEX IF NOT EXISTS idx_students_fullname ON students (fullname)',
+    ]),
+    (4, [
+        # Chat history: one canonical key per conversation so both directions share a single index range
+        'ALTER TABLE messages ADD COLUMN conversation TEXT',
+        '''UPDATE messages SET conversation = CASE
+               WHEN sender < receiver THEN sender || char(31) || receiver
+               ELSE receiver || char(31) || sender
+           END''',
+        'CREATE INDEX IF NOT EXISTS idx_messages_conversation ON messages (conversation, id)',
+        'DROP INDEX IF EXISTS idx_messages_pair_time',
+    ]),
+    (5, [
+        # Shared write counters used for cache validation and ETags
+        '''CREATE TABLE IF NOT EXISTS table_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID''',
+        *[statement for table in VERSIONED_TABLES for statement in table_version_triggers(table)],
+        # Upcoming future tests: date range scan in display order
+        'CREATE INDEX IF NOT EXISTS idx_future_tests_date ON future_tests (test_date, test_time)',
+    ]),
+    (6, [
+        # Per-(instructor, subject, term) rating totals kept up to date by add_evaluation
+        '''CREATE TABLE IF NOT EXISTS evaluation_stats (
+            instructor_id INTEGER NOT NULL,
+            subject TEXT NOT NULL,
+            term TEXT NOT NULL,
+            evaluations INTEGER NOT NULL DEFAULT 0,
+            teaching_quality_sum INTEGER NOT NULL DEFAULT 0,
+            course_content_sum INTEGER NOT NULL DEFAULT 0,
+            communication_sum INTEGER NOT NULL DEFAULT 0,
+            overall_rating_sum INTEGER NOT NULL DEFAULT 0,
+            overall_1 INTEGER NOT NULL DEFAULT 0,
+            overall_2 INTEGER NOT NULL DEFAULT 0,
+            overall_3 INTEGER NOT NULL DEFAULT 0,
+            overall_4 INTEGER NOT NULL DEFAULT 0,
+            overall_5 INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (instructor_id, subject, term)
+        ) WITHOUT ROWID''',
+        f'''INSERT OR REPLACE INTO evaluation_stats
+           SELECT instructor_id, subject, {EVALUATION_TERM_SQL}, COUNT(*),
+                  SUM(teaching_quality), SUM(course_content), SUM(communication), SUM(overall_rating),
+                  SUM(overall_rating = 1), SUM(overall_rating = 2), SUM(overall_rating = 3),
+                  SUM(overall_rating = 4), SUM(overall_rating = 5)
+           FROM evaluations
+           GROUP BY 1, 2, 3''',
+    ]),
+    (7, [
+        # Learning resource catalog; slug names downloadable guides (/api/coding-resources/<slug>)
+        '''CREATE TABLE IF NOT EXISTS resources (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            description TEXT NOT NULL DEFAULT '',
+            subject TEXT,
+            resource_type TEXT NOT NULL,
+            tags TEXT NOT NULL DEFAULT '',
+            url TEXT,
+            drive_file_id TEXT,
+            slug TEXT UNIQUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+        *table_version_triggers('resources'),
+        # What used to be the hardcoded mock list and download map
+        '''INSERT INTO resources (title, description, subject, resource_type, tags, url, drive_file_id, slug) VALUES
+            ('Mathematics Formula Sheet', 'Complete formula sheet for calculus and algebra',
+             'Mathematics', 'document', 'formulas,calculus,algebra', 'https://example.com/math-formulas', NULL, NULL),
+            ('Physics Video Lectures', 'Video lectures covering mechanics and thermodynamics',
+             'Physics', 'video', 'mechanics,thermodynamics,lectures', 'https://example.com/physics-lectures', NULL, NULL),
+            ('Python Guide', 'Python programming guide', 'Programming', 'guide', 'python,coding',
+             NULL, '17-onD-fMI7gKBQjtN8i1y2Skl_EqgDCN', 'python'),
+            ('JavaScript Guide', 'JavaScript programming guide', 'Programming', 'guide', 'javascript,coding,web',
+             NULL, '17-onD-fMI7gKBQjtN8i1y2Skl_EqgDCN', 'javascript'),
+            ('Data Structures Guide', 'Data structures guide', 'Programming', 'guide', 'data-structures,algorithms,coding',
+             NULL, '17-onD-fMI7gKBQjtN8i1y2Skl_EqgDCN', 'data-structures')''',
+    ]),
+    (8, [
+        # Prefix of idx_results_student_term: cost every results write and made the planner skip the covering index
+        'DROP INDEX IF EXISTS idx_results_keyset',
+    ]),
+]
+
+# Statements that keep the student search index in sync with the students table
+STUDENT_SEARCH_SCHEMA = [
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS students_fts USING fts5(
+        username, fullname, email,
+        content='students', content_rowid='id', tokenize='trigram'
+    )''',
+    '''CREATE TRIGGER IF NOT EXISTS students_fts_insert AFTER INSERT ON students BEGIN
+        INSERT INTO students_fts (rowid, username, fullname, email)
+        VALUES (new.id, new.username, new.fullname, new.email);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS students_fts_delete AFTER DELETE ON students BEGIN
+        INSERT INTO students_fts (students_fts, rowid, username, fullname, email)
+        VALUES ('delete', old.id, old.username, old.fullname, old.email);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS students_fts_update AFTER UPDATE OF username, fullname, email ON students BEGIN
+        INSERT INTO students_fts (students_fts, rowid, username, fullname, email)
+        VALUES ('delete', old.id, old.username, old.fullname, old.email);
+        INSERT INTO students_fts (rowid, username, fullname, email)
+        VALUES (new.id, new.username, new.fullname, new.email);
+    END''',
+    "INSERT INTO students_fts (students_fts) VALUES ('rebuild')",
+]
+
+# Build the student search index; SQLite builds without FTS5 trigram support keep using LIKE search
+def create_student_search_index(conn):
+    try:
+        conn.execute('SAVEPOINT student_search')
+        for statement in STUDENT_SEARCH_SCHEMA:
+            conn.execute(statement)
+        conn.execute('RELEASE student_search')
+    except sqlite3.OperationalError as e:
+        conn.execute('ROLLBACK TO student_search')
+        conn.execute('RELEASE student_search')
+        print(f"Student search index unavailable, falling back to LIKE search: {str(e)}")
+
+# Apply pending migrations in order and refresh planner statistics when anything changed
+def run_migrations(conn):
+    current = conn.execute('PRAGMA user_version').fetchone()[0]
+    applied = []
+    for version, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        try:
+            conn.execute('BEGIN')
+            for statement in statements:
+                if callable(statement):
+                    statement(conn)
+                else:
+                    conn.execute(statement)
+            conn.execute(f'PRAGMA user_version = {int(version)}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+    if applied:
+        conn.execute('ANALYZE')
+        conn.commit()
+    return applied
+
+# Latest schema version; a database stamped with it (PRAGMA user_version) needs no startup work
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# Initialize the database and create required tables; returns the migrations applied.
+# Cheap when the database is current: one PRAGMA read, no DDL.
+def init_db(force=False):
+    conn = get_connection()
+    try:
+        if not force and conn.execute('PRAGMA user_version').fetchone()[0] >= SCHEMA_VERSION:
+            return []
+        return _create_schema(conn)
+    finally:
+        release_connection(conn)
+
+# Helper: base tables, then pending migrations
+def _create_schema(conn):
     cursor = conn.cursor()
 
     # Create students table with required fields
@@ -95,90 +461,92 @@ def init_db():
     )
     ''')
 
-    # Add test users if they don't exist
-    test_student = ('student1', 'password123', 'Test Student', 'student1@example.com')
-    test_instructor = ('instructor1', 'password123', 'Test Instructor', 'instructor1@example.com', 'Mathematics')
+    conn.commit()
 
-    # Check if test student exists and add if not
-    cursor.execute('SELECT username FROM students WHERE username = ?', (test_student[0],))
-    if not cursor.fetchone():
-        hashed_password = generate_password_hash(test_student[1])
-        cursor.execute('INSERT INTO students (username, password, fullname, email) VALUES (?, ?, ?, ?)',
-                      (test_student[0], hashed_password, test_student[2], test_student[3]))
+    # Bring indexes and other schema changes up to date
+    return run_migrations(conn)
 
-    # Check if test instructor exists and add if not
-    cursor.execute('SELECT username FROM instructors WHERE username = ?', (test_instructor[0],))
-    if not cursor.fetchone():
-        hashed_password = generate_password_hash(test_instructor[1])
-        cursor.execute('INSERT INTO instructors (username, password, fullname, email, subject) VALUES (?, ?, ?, ?, ?)',
-                      (test_instructor[0], hashed_password, test_instructor[2], test_instructor[3], test_instructor[4]))
+# Demo accounts for local development; created by the seed-users CLI command, never at startup
+TEST_USERS = {
+    'students': [('student1', 'password123', 'Test Student', 'student1@example.com')],
+    'instructors': [('instructor1', 'password123', 'Test Instructor', 'instructor1@example.com', 'Mathematics')],
+}
 
-    conn.commit()
-    conn.close()
+# Add the demo accounts that do not exist yet; returns the usernames created
+def seed_test_users():
+    created = []
+    for username, password, fullname, email in TEST_USERS['students']:
+        if add_student(username, password, fullname, email):
+            created.append(username)
+    for username, password, fullname, email, subject in TEST_USERS['instructors']:
+        if add_instructor(username, password, fullname, email, subject):
+            created.append(username)
+    return created
 
 # Add a new student to the database
 def add_student(username, password, fullname=None, email=None):
     if not all([username, password, fullname, email]):
         return False
         
-    conn = sqlite3.connect('study_hub.db')
-    cursor = conn.cursor()
-    try:
+    # Hash here, not on the writer thread, so other queued writes are not held up behind it
+    hashed_password = hash_password(password)
+
+    def insert(cursor):
         # Check if username or email already exists
-        cursor.execute('SELECT username, email FROM students WHERE username = ? OR email = ?', 
-                      (username, email))
+        cursor.execute('SELECT username, email FROM students WHERE username = ? OR email = ?',
+                       (username, email))
         if cursor.fetchone():
-            return False
-
-        # Hash password and insert new student
-        hashed_password = generate_password_hash(password)
+            return None
         cursor.execute('''
             INSERT INTO students (username, fullname, email, password) 
             VALUES (?, ?, ?, ?)
         ''', (username, fullname, email, hashed_password))
-        conn.commit()
-        return True
+        return cursor.lastrowid
+
+    try:
+        return _writer.submit(insert, on_commit=lambda _: bump_table_version('students')).result(WRITE_TIMEOUT) is not None
     except sqlite3.IntegrityError:
         return False
     except Exception as e:
         print(f"Error adding student: {str(e)}")
         return False
-    finally:
-        conn.close()
 
 # Add a new instructor to the database
 def add_instructor(username, password, fullname=None, email=None, subject=None):
     if not all([username, password, fullname, email, subject]):
         return False
         
-    conn = sqlite3.connect('study_hub.db')
-    cursor = conn.cursor()
-    try:
+    # Hash here, not on the writer thread, so other queued writes are not held up behind it
+    hashed_password = hash_password(password)
+
+    def insert(cursor):
         # Check if username or email already exists
-        cursor.execute('SELECT username, email FROM instructors WHERE username = ? OR email = ?', 
-                      (username, email))
+        cursor.execute('SELECT username, email FROM instructors WHERE username = ? OR email = ?',
+                       (username, email))
         if cursor.fetchone():
-            return False
-
-        # Hash password and insert new instructor
-        hashed_password = generate_password_hash(password)
+            return None
         cursor.execute('''
             INSERT INTO instructors (username, fullname, email, password, subject) 
             VALUES (?, ?, ?, ?, ?)
         ''', (username, fullname, email, hashed_password, subject))
-        conn.commit()
-        return True
+        return cursor.lastrowid
+
+    try:
+        return _writer.submit(insert, on_commit=lambda _: bump_table_version('instructors')).result(WRITE_TIMEOUT) is not None
     except sqlite3.IntegrityError:
         return False
     except Exception as e:
         print(f"Error adding instructor: {str(e)}")
         return False
-    finally:
-        conn.close()
+
+# Helper (writer operation): store an upgraded password hash
+def _set_password(cursor, table, key_column, hashed_password, key):
+    cursor.execute(f'UPDATE {table} SET password = ? WHERE {key_column} = ?', (hashed_password, key))
+    return cursor.rowcount
 
 # Verify student login credentials
 def verify_student(username, password):
-    conn = sqlite3.connect('study_hub.db')
+    conn = get_connection()
     cursor = conn.cursor()
     try:
         print(f"Attempting to verify student: {username}")
@@ -200,8 +568,12 @@ def verify_student(username, password):
             print(f"Found user: {found_username} ({found_email})")
             
             # Verify password hash
-            if check_password_hash(stored_password, password):
+            if check_password(stored_password, password):
                 print("Password verified successfully")
+                # Upgrade hashes made with older parameters while we have the plain password
+                if needs_rehash(stored_password):
+                    _writer.submit(_set_password, 'students', 'username', hash_password(password),
+                                   found_username).result(WRITE_TIMEOUT)
                 return True
             else:
                 print("Password verification failed")
@@ -213,142 +585,336 @@ def verify_student(username, password):
         print(f"Error verifying student: {str(e)}")
         return False
     finally:
-        conn.close()
+        release_connection(conn)
 
 # Verify instructor login credentials
 def verify_instructor(username, password):
-    conn = sqlite3.connect('study_hub.db')
+    conn = get_connection()
     cursor = conn.cursor()
     try:
         # First try to find by username
-        cursor.execute('SELECT password FROM instructors WHERE username = ?', (username,))
+        cursor.execute('SELECT password, id FROM instructors WHERE username = ?', (username,))
         result = cursor.fetchone()
         
         # If not found by username, try by email
         if not result:
-            cursor.execute('SELECT password FROM instructors WHERE email = ?', (username,))
+            cursor.execute('SELECT password, id FROM instructors WHERE email = ?', (username,))
             result = cursor.fetchone()
         
         if result:
-            return check_password_hash(result[0], password)
+            if not check_password(result[0], password):
+                return False
+            # Upgrade hashes made with older parameters while we have the plain password
+            if needs_rehash(result[0]):
+                _writer.submit(_set_password, 'instructors', 'id', hash_password(password),
+                               result[1]).result(WRITE_TIMEOUT)
+            return True
         return False
     except Exception as e:
         print(f"Error verifying instructor: {str(e)}")
         return False
     finally:
-        conn.close()
+        release_connection(conn)
 
-# Search for students by username, full name (partial match), or ID
-def search_students(search_term):
-    conn = sqlite3.connect('study_hub.db')
+# Search for students by username, full name, email or ID, best matches first
+def search_students(search_term, limit=50):
+    search_term = search_term.strip()
+    if not search_term:
+        return []
+
+    conn = get_connection()
     cursor = conn.cursor()
     try:
-        # Search by username, full name (partial match), or ID
-        cursor.execute('''
-            SELECT id, username, fullname, email
-            FROM students
-            WHERE username LIKE ? OR id LIKE ? OR fullname LIKE ?
-        ''', (f'%{search_term}%', f'%{search_term}%', f'%{search_term}%'))
-        
-        results = cursor.fetchall()
-        return [{'id': row[0], 'username': row[1], 'fullname': row[2], 'email': row[3]} for row in results]
+        rows = []
+
+        # Fast path: an exact student ID is a primary key lookup
+        if search_term.isdigit():
+            cursor.execute('SELECT id, username, fullname, email FROM students WHERE id = ?', (int(search_term),))
+            rows.extend(cursor.fetchall())
+
+        remaining = limit - len(rows)
+        if remaining > 0:
+            exclude_id = rows[0][0] if rows else None
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'students_fts'")
+            has_fts = cursor.fetchone() is not None
+
+            # The trigram tokenizer needs at least three characters to match anything
+            if has_fts and len(search_term) >= 3:
+                fts_query = '"' + search_term.replace('"', '""') + '"'
+                cursor.execute('''
+                    SELECT s.id, s.username, s.fullname, s.email
+                    FROM students_fts
+                    JOIN students s ON s.id = students_fts.rowid
+                    WHERE students_fts MATCH ? AND s.id IS NOT ?
+                    ORDER BY (s.username = ?) DESC, students_fts.rank
+                    LIMIT ?
+                ''', (fts_query, exclude_id, search_term, remaining))
+            else:
+                pattern = f'%{search_term}%'
+                cursor.execute('''
+                    SELECT id, username, fullname, email
+                    FROM students
+                    WHERE (username LIKE ? OR fullname LIKE ? OR email LIKE ?) AND id IS NOT ?
+                    ORDER BY (username = ?) DESC, fullname
+                    LIMIT ?
+                ''', (pattern, pattern, pattern, exclude_id, search_term, remaining))
+            rows.extend(cursor.fetchall())
+
+        return [{'id': row[0], 'username': row[1], 'fullname': row[2], 'email': row[3]} for row in rows]
     finally:
-        conn.close()
+        release_connection(conn)
 
-# Add a new result for a student
-def add_result(student_id, subject, marks, grade, credits, semester, academic_year):
-    conn = sqlite3.connect('study_hub.db')
-    cursor = conn.cursor()
-    try:
+# Queue a new result for a student; the future resolves to its row id once committed
+def queue_add_result(student_id, subject, marks, grade, credits, semester, academic_year):
+    def insert(cursor):
         cursor.execute('''
             INSERT INTO results (student_id, subject, marks, grade, credits, semester, academic_year)
             VALUES (?, ?, ?, ?, ?, ?, ?)
         ''', (student_id, subject, marks, grade, credits, semester, academic_year))
-        conn.commit()
+        return cursor.lastrowid
+    return _writer.submit(insert, on_commit=lambda _: bump_table_version('results'))
+
+# Add a new result for a student
+def add_result(student_id, subject, marks, grade, credits, semester, academic_year):
+    try:
+        queue_add_result(student_id, subject, marks, grade, credits, semester, academic_year).result(WRITE_TIMEOUT)
         return True
     except Exception as e:
         print(f"Error adding result: {str(e)}")
         return False
-    finally:
-        conn.close()
 
-# Get student information by username
-def get_student_by_username(username):
-    conn = sqlite3.connect('study_hub.db')
+# Add many results in a single transaction; rows are tuples in add_result argument order
+def add_results_bulk(rows, chunk_size=5000):
+    def insert(cursor):
+        inserted = 0
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            cursor.executemany('''
+                INSERT INTO results (student_id, subject, marks, grade, credits, semester, academic_year)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', chunk)
+            inserted += len(chunk)
+        return inserted
+
+    try:
+        # One writer operation, so the whole upload commits or rolls back together
+        return _writer.submit(insert, on_commit=lambda inserted: inserted and bump_table_version('results')).result(WRITE_TIMEOUT)
+    except Exception as e:
+        print(f"Error adding results in bulk: {str(e)}")
+        raise
+
+# Helper: which of the given student ids exist
+def get_existing_student_ids(student_ids, chunk_size=500):
+    student_ids = list(set(student_ids))
+    conn = get_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute('SELECT id, username FROM students WHERE username = ?', (username,))
-        result = cursor.fetchone()
-        if not result:
-            cursor.execute('SELECT id, username FROM students WHERE email = ?', (username,))
-            result = cursor.fetchone()
-        if result:
-            return {'id': result[0], 'username': result[1]}
-        return None
+        existing = set()
+        for start in range(0, len(student_ids), chunk_size):
+            chunk = student_ids[start:start + chunk_size]
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(f'SELECT id FROM students WHERE id IN ({placeholders})', chunk)
+            existing.update(row[0] for row in cursor.fetchall())
+        return existing
     finally:
-        conn.close()
+        release_connection(conn)
 
-# Helper: get student full name by username/email
-def get_student_fullname(username):
-    conn = sqlite3.connect('study_hub.db')
+# Queue an update of marks, grade and credits; the future resolves to the rowcount
+def queue_update_result(result_id, marks, grade, credits):
+    def update(cursor):
+        cursor.execute('''
+            UPDATE results
+            SET marks = ?, grade = ?, credits = ?
+            WHERE id = ?
+        ''', (marks, grade, credits, result_id))
+        return cursor.rowcount
+    return _writer.submit(update, on_commit=lambda _: bump_table_version('results'))
+
+# Update marks, grade and credits of an existing result
+def update_result_db(result_id, marks, grade, credits):
+    return queue_update_result(result_id, marks, grade, credits).result(WRITE_TIMEOUT) > 0
+
+# Queue a result deletion; the future resolves to the rowcount
+def queue_delete_result(result_id):
+    def delete(cursor):
+        cursor.execute('DELETE FROM results WHERE id = ?', (result_id,))
+        return cursor.rowcount
+    return _writer.submit(delete, on_commit=lambda _: bump_table_version('results'))
+
+# Delete a result by id
+def delete_result_db(result_id):
+    return queue_delete_result(result_id).result(WRITE_TIMEOUT) > 0
+
+# Get a student's full record by username or email in one query (username matches win)
+def get_student_record(username):
+    conn = get_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute('SELECT fullname FROM students WHERE username = ? OR email = ?', (username, username))
+        cursor.execute('''
+            SELECT id, username, fullname, email FROM students
+            WHERE username = ? OR email = ?
+            ORDER BY username = ? DESC
+            LIMIT 1
+        ''', (username, username, username))
         row = cursor.fetchone()
-        return row[0] if row else None
+        if row:
+            return {'id': row[0], 'username': row[1], 'fullname': row[2], 'email': row[3]}
+        return None
     finally:
-        conn.close()
+        release_connection(conn)
+
+# Helper: build the WHERE clause shared by the result filters
+def _results_filter_clause(student, subject, year, semester, student_id=None):
+    clause = ' WHERE 1=1'
+    params = []
+    if student_id is not None:
+        clause += ' AND s.id = ?'
+        params.append(student_id)
+    if student:
+        clause += ' AND (s.fullname LIKE ? OR s.username LIKE ? OR s.id LIKE ?)'
+        params.extend([f'%{student}%', f'%{student}%', f'%{student}%'])
+    if subject:
+        clause += ' AND r.subject LIKE ?'
+        params.append(f'%{subject}%')
+    if year:
+        clause += ' AND r.academic_year = ?'
+        params.append(year)
+    if semester:
+        clause += ' AND r.semester = ?'
+        params.append(semester)
+    return clause, params
 
-# Helper: get all results joined with students (used by instructor views)
-def get_all_results_joined():
-    conn = sqlite3.connect('study_hub.db')
+# Helper: filter results with optional params
+def filter_results_db(student:str, subject:str, year:str, semester:str):
+    conn = get_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute('''
+        query = '''
             SELECT r.id, s.fullname as student_name, r.subject, r.marks, r.grade,
                    r.credits, r.academic_year, r.semester
             FROM results r
             JOIN students s ON r.student_id = s.id
-            ORDER BY s.fullname, r.academic_year, r.semester, r.subject
-        ''')
+        '''
+        clause, params = _results_filter_clause(student, subject, year, semester)
+        query += clause
+        query += ' ORDER BY s.fullname, r.academic_year, r.semester, r.subject'
+        cursor.execute(query, params)
         return cursor.fetchall()
     finally:
-        conn.close()
+        release_connection(conn)
 
-# Helper: filter results with optional params
-def filter_results_db(student:str, subject:str, year:str, semester:str):
-    conn = sqlite3.connect('study_hub.db')
+# Helper: turn the sort key of the last row on a page into an opaque cursor and back
+def encode_cursor(key):
+    raw = json.dumps(list(key), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor_value, length, types=None):
+    try:
+        padded = cursor_value + '=' * (-len(cursor_value) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(key, list) or len(key) != length:
+        raise ValueError('Invalid cursor')
+    # A well-formed but tampered cursor must not reach the SQL comparison with the wrong types
+    if types and not all(isinstance(value, kind) and not isinstance(value, bool) for value, kind in zip(key, types)):
+        raise ValueError('Invalid cursor')
+    return key
+
+# Helper: one page of (optionally filtered) results, resuming after an opaque cursor; student_id matches exactly
+# Rows keep the filter_results_db column layout; next_cursor is None on the last page
+def get_results_page(student='', subject='', year='', semester='', page_size=100, cursor_value=None, student_id=None):
+    conn = get_connection()
     cursor = conn.cursor()
     try:
         query = '''
             SELECT r.id, s.fullname as student_name, r.subject, r.marks, r.grade,
-                   r.credits, r.academic_year, r.semester
+                   r.credits, r.academic_year, r.semester, s.id
+            FROM students s
+            JOIN results r ON r.student_id = s.id
+        '''
+        clause, params = _results_filter_clause(student, subject, year, semester, student_id)
+        query += clause
+        if cursor_value:
+            fullname, student_id, academic_year, semester_key, subject_key, result_id = decode_cursor(cursor_value, 6, (str, int, str, str, str, int))
+            # The first comparison lets SQLite seek the name index; the second resumes inside a student
+            query += '''
+                AND (s.fullname, s.id) >= (?, ?)
+                AND (s.fullname, s.id, r.academic_year, r.semester, r.subject, r.id) > (?, ?, ?, ?, ?, ?)
+            '''
+            params.extend([fullname, student_id, fullname, student_id, academic_year, semester_key, subject_key, result_id])
+        query += ' ORDER BY s.fullname, s.id, r.academic_year, r.semester, r.subject, r.id LIMIT ?'
+        # Fetch one extra row to know whether another page exists
+        params.append(page_size + 1)
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = rows[-1]
+            next_cursor = encode_cursor((last[1], last[8], last[6], last[7], last[2], last[0]))
+        return [row[:8] for row in rows], next_cursor
+    finally:
+        release_connection(conn)
+
+# Cached totals for get_results_page, keyed by filters and dropped when results or students change
+RESULTS_COUNT_TTL = 30
+_results_count_cache = {}
+
+# Helper: count the results matching the filters
+def count_results_db(student='', subject='', year='', semester='', student_id=None):
+    key = (student, subject, year, semester, student_id)
+    versions = (get_table_version('results'), get_table_version('students'))
+    cached = _results_count_cache.get(key)
+    if cached and cached[0] == versions and cached[1] > time.monotonic():
+        return cached[2]
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        clause, params = _results_filter_clause(student, subject, year, semester, student_id)
+        cursor.execute('SELECT COUNT(*) FROM results r JOIN students s ON r.student_id = s.id' + clause, params)
+        total = cursor.fetchone()[0]
+    finally:
+        release_connection(conn)
+
+    if len(_results_count_cache) > 256:
+        _results_count_cache.clear()
+    _results_count_cache[key] = (versions, time.monotonic() + RESULTS_COUNT_TTL, total)
+    return total
+
+# Columns written by the results export, in order
+RESULTS_EXPORT_COLUMNS = (
+    'id', 'student_id', 'student_name', 'username', 'subject', 'marks', 'grade',
+    'credits', 'academic_year', 'semester', 'created_at'
+)
+
+# Helper: stream (optionally filtered) results in batches without loading them all into memory
+# Uses its own pooled connection so it can outlive the request that started it
+def iter_results_export(student='', subject='', year='', semester='', batch_size=1000):
+    conn = _pool.acquire()
+    try:
+        cursor = conn.cursor()
+        query = '''
+            SELECT r.id, s.id, s.fullname, s.username, r.subject, r.marks, r.grade,
+                   r.credits, r.academic_year, r.semester, r.created_at
             FROM results r
             JOIN students s ON r.student_id = s.id
-            WHERE 1=1
         '''
-        params = []
-        if student:
-            query += ' AND (s.fullname LIKE ? OR s.username LIKE ? OR s.id LIKE ?)'
-            params.extend([f'%{student}%', f'%{student}%', f'%{student}%'])
-        if subject:
-            query += ' AND r.subject LIKE ?'
-            params.append(f'%{subject}%')
-        if year:
-            query += ' AND r.academic_year = ?'
-            params.append(year)
-        if semester:
-            query += ' AND r.semester = ?'
-            params.append(semester)
-        query += ' ORDER BY s.fullname, r.academic_year, r.semester, r.subject'
-        cursor.execute(query, params)
-        return cursor.fetchall()
+        clause, params = _results_filter_clause(student, subject, year, semester)
+        cursor.execute(query + clause + ' ORDER BY r.id', params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
     finally:
-        conn.close()
+        _pool.release(conn)
 
 # Get student results for a specific year and semester
 def get_student_results(student_id, year, semester):
-    conn = sqlite3.connect('study_hub.db')
+    conn = get_connection()
     cursor = conn.cursor()
     try:
         cursor.execute('''
@@ -366,52 +932,68 @@ def get_student_results(student_id, year, semester):
             'credits': row[3]
         } for row in results]
     finally:
-        conn.close()
+        release_connection(conn)
+
+# Queue a chat message; the future resolves to its row id once committed
+def queue_send_message(sender, receiver, message):
+    def insert(cursor):
+        cursor.execute('''
+            INSERT INTO messages (sender, receiver, message, conversation) VALUES (?, ?, ?, ?)
+        ''', (sender, receiver, message, conversation_key(sender, receiver)))
+        return cursor.lastrowid
+    # Wake anyone long-polling or streaming this conversation
+    return _writer.submit(insert, on_commit=lambda _: chat_notifier.notify(sender, receiver))
 
 def send_message(sender, receiver, message):
-    conn = sqlite3.connect('study_hub.db')
-    cursor = conn.cursor()
     try:
-        cursor.execute('''
-            INSERT INTO messages (sender, receiver, message) VALUES (?, ?, ?)
-        ''', (sender, receiver, message))
-        conn.commit()
+        queue_send_message(sender, receiver, message).result(WRITE_TIMEOUT)
         return True
     except Exception as e:
         print(f"Error sending message: {str(e)}")
         return False
-    finally:
-        conn.close()
 
-def get_chat_history(user1, user2, limit=100):
-    conn = sqlite3.connect('study_hub.db')
+# Get chat history between two users, oldest first
+# Without cursors this is the latest page; before_id scrolls back, after_id returns only newer messages
+def get_chat_history(user1, user2, limit=100, after_id=None, before_id=None):
+    conn = get_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute('''
-            SELECT sender, receiver, message, timestamp FROM messages
-            WHERE (sender = ? AND receiver = ?) OR (sender = ? AND receiver = ?)
-            ORDER BY timestamp ASC
-            LIMIT ?
-        ''', (user1, user2, user2, user1, limit))
-        messages = cursor.fetchall()
+        conversation = conversation_key(user1, user2)
+        if after_id is not None:
+            cursor.execute('''
+                SELECT id, sender, receiver, message, timestamp FROM messages
+                WHERE conversation = ? AND id > ?
+                ORDER BY id ASC
+                LIMIT ?
+            ''', (conversation, after_id, limit))
+            messages = cursor.fetchall()
+        else:
+            cursor.execute('''
+                SELECT id, sender, receiver, message, timestamp FROM messages
+                WHERE conversation = ? AND id < ?
+                ORDER BY id DESC
+                LIMIT ?
+            ''', (conversation, before_id if before_id is not None else 2 ** 63 - 1, limit))
+            messages = cursor.fetchall()[::-1]
         return [
             {
-                'sender': row[0],
-                'receiver': row[1],
-                'message': row[2],
-                'timestamp': row[3]
+                'id': row[0],
+                'sender': row[1],
+                'receiver': row[2],
+                'message': row[3],
+                'timestamp': row[4]
             } for row in messages
         ]
     except Exception as e:
         print(f"Error fetching chat history: {str(e)}")
         return []
     finally:
-        conn.close()
+        release_connection(conn)
 
 
 # Get instructor by username
 def get_instructor_by_username(username):
-    conn = sqlite3.connect('study_hub.db')
+    conn = get_connection()
     cursor = conn.cursor()
     try:
         cursor.execute('SELECT id, username, fullname, email, subject FROM instructors WHERE username = ? OR email = ?', (username, username))
@@ -423,28 +1005,31 @@ def get_instructor_by_username(username):
         print(f"Error getting instructor: {str(e)}")
         return None
     finally:
-        conn.close()
+        release_connection(conn)
 
-# Add a future test
-def add_future_test(subject, test_date, test_time, duration, location, test_type, description, instructor_id):
-    conn = sqlite3.connect('study_hub.db')
-    cursor = conn.cursor()
-    try:
+# Queue a future test; the future resolves to its row id once committed
+def queue_add_future_test(subject, test_date, test_time, duration, location, test_type, description, instructor_id):
+    def insert(cursor):
         cursor.execute('''
             INSERT INTO future_tests (subject, test_date, test_time, duration, location, test_type, description, instructor_id)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?)
         ''', (subject, test_date, test_time, duration, location, test_type, description, instructor_id))
-        conn.commit()
+        return cursor.lastrowid
+    return _writer.submit(insert, on_commit=lambda _: bump_table_version('future_tests'))
+
+# Add a future test
+def add_future_test(subject, test_date, test_time, duration, location, test_type, description, instructor_id):
+    try:
+        queue_add_future_test(subject, test_date, test_time, duration, location, test_type,
+                              description, instructor_id).result(WRITE_TIMEOUT)
         return True
     except Exception as e:
         print(f"Error adding future test: {str(e)}")
         return False
-    finally:
-        conn.close()
 
 # Get all future tests
 def get_all_future_tests():
-    conn = sqlite3.connect('study_hub.db')
+    conn = get_connection()
     cursor = conn.cursor()
     try:
         cursor.execute('''
@@ -464,11 +1049,39 @@ def get_all_future_tests():
         print(f"Error getting future tests: {str(e)}")
         return []
     finally:
-        conn.close()
+        release_connection(conn)
+
+# Get future tests scheduled between two dates (inclusive; no end date means open-ended),
+# shaped the way /api/student/future-tests returns them
+def get_upcoming_future_tests(start_date, end_date=None):
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        query = '''
+            SELECT ft.id, ft.subject, ft.test_date, ft.test_time, ft.duration,
+                   ft.location, ft.test_type, ft.description, i.fullname as instructor_name
+            FROM future_tests ft
+            -- CROSS JOIN keeps future_tests as the outer loop so the date index drives the scan
+            CROSS JOIN instructors i ON ft.instructor_id = i.id
+            WHERE ft.test_date >= ?
+        '''
+        params = [start_date]
+        if end_date:
+            query += ' AND ft.test_date <= ?'
+            params.append(end_date)
+        query += ' ORDER BY ft.test_date ASC, ft.test_time ASC'
+        cursor.execute(query, params)
+        return [{
+            'id': row[0], 'subject': row[1], 'date': row[2], 'time': row[3],
+            'duration': row[4], 'location': row[5], 'test_type': row[6],
+            'description': row[7], 'instructor_name': row[8]
+        } for row in cursor.fetchall()]
+    finally:
+        release_connection(conn)
 
 # Get future tests by instructor
 def get_future_tests_by_instructor(instructor_id):
-    conn = sqlite3.connect('study_hub.db')
+    conn = get_connection()
     cursor = conn.cursor()
     try:
         cursor.execute('''
@@ -486,87 +1099,169 @@ def get_future_tests_by_instructor(instructor_id):
         print(f"Error getting instructor's future tests: {str(e)}")
         return []
     finally:
-        conn.close()
+        release_connection(conn)
 
 # Update a future test
 def update_future_test(test_id, subject, test_date, test_time, duration, location, test_type, description):
-    conn = sqlite3.connect('study_hub.db')
-    cursor = conn.cursor()
-    try:
+    def update(cursor):
         cursor.execute('''
             UPDATE future_tests 
             SET subject = ?, test_date = ?, test_time = ?, duration = ?, 
                 location = ?, test_type = ?, description = ?
             WHERE id = ?
         ''', (subject, test_date, test_time, duration, location, test_type, description, test_id))
-        conn.commit()
-        return cursor.rowcount > 0
+        return cursor.rowcount
+
+    try:
+        return _writer.submit(update, on_commit=lambda _: bump_table_version('future_tests')).result(WRITE_TIMEOUT) > 0
     except Exception as e:
         print(f"Error updating future test: {str(e)}")
         return False
-    finally:
-        conn.close()
 
 # Delete a future test
 def delete_future_test(test_id):
-    conn = sqlite3.connect('study_hub.db')
-    cursor = conn.cursor()
-    try:
+    def delete(cursor):
         cursor.execute('DELETE FROM future_tests WHERE id = ?', (test_id,))
-        conn.commit()
-        return cursor.rowcount > 0
+        return cursor.rowcount
+
+    try:
+        return _writer.submit(delete, on_commit=lambda _: bump_table_version('future_tests')).result(WRITE_TIMEOUT) > 0
     except Exception as e:
         print(f"Error deleting future test: {str(e)}")
         return False
-    finally:
-        conn.close()
 
-# Add an evaluation
-def add_evaluation(student_id, instructor_id, subject, teaching_quality, course_content, communication, overall_rating, comments):
-    conn = sqlite3.connect('study_hub.db')
-    cursor = conn.cursor()
-    try:
+# Helper: add (sign=1) or remove (sign=-1) one evaluation from the rating aggregates
+def _apply_evaluation_stats(cursor, instructor_id, subject, term, ratings, sign):
+    teaching_quality, course_content, communication, overall_rating = ratings
+    histogram = [sign if int(overall_rating) == value else 0 for value in range(1, 6)]
+    cursor.execute('''
+        INSERT INTO evaluation_stats (instructor_id, subject, term, evaluations,
+            teaching_quality_sum, course_content_sum, communication_sum, overall_rating_sum,
+            overall_1, overall_2, overall_3, overall_4, overall_5)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (instructor_id, subject, term) DO UPDATE SET
+            evaluations = evaluations + excluded.evaluations,
+            teaching_quality_sum = teaching_quality_sum + excluded.teaching_quality_sum,
+            course_content_sum = course_content_sum + excluded.course_content_sum,
+            communication_sum = communication_sum + excluded.communication_sum,
+            overall_rating_sum = overall_rating_sum + excluded.overall_rating_sum,
+            overall_1 = overall_1 + excluded.overall_1,
+            overall_2 = overall_2 + excluded.overall_2,
+            overall_3 = overall_3 + excluded.overall_3,
+            overall_4 = overall_4 + excluded.overall_4,
+            overall_5 = overall_5 + excluded.overall_5
+    ''', (instructor_id, subject, term, sign, sign * int(teaching_quality), sign * int(course_content),
+          sign * int(communication), sign * int(overall_rating), *histogram))
+    if sign < 0:
+        cursor.execute('''
+            DELETE FROM evaluation_stats
+            WHERE instructor_id = ? AND subject = ? AND term = ? AND evaluations <= 0
+        ''', (instructor_id, subject, term))
+
+# Queue an evaluation (replacing the student's earlier one for the same instructor and subject);
+# the future resolves to its row id once committed
+def queue_add_evaluation(student_id, instructor_id, subject, teaching_quality, course_content, communication, overall_rating, comments):
+    def insert(cursor):
+        # Take the previous evaluation, if any, out of the aggregates before it is replaced
+        cursor.execute(f'''
+            SELECT {EVALUATION_TERM_SQL}, teaching_quality, course_content, communication, overall_rating
+            FROM evaluations
+            WHERE student_id = ? AND instructor_id = ? AND subject = ?
+        ''', (student_id, instructor_id, subject))
+        previous = cursor.fetchone()
+
         cursor.execute('''
             INSERT OR REPLACE INTO evaluations 
             (student_id, instructor_id, subject, teaching_quality, course_content, communication, overall_rating, comments)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?)
         ''', (student_id, instructor_id, subject, teaching_quality, course_content, communication, overall_rating, comments))
-        conn.commit()
+        evaluation_id = cursor.lastrowid
+
+        if previous:
+            _apply_evaluation_stats(cursor, instructor_id, subject, previous[0], previous[1:], -1)
+        cursor.execute(f'SELECT {EVALUATION_TERM_SQL} FROM evaluations WHERE id = ?', (evaluation_id,))
+        term = cursor.fetchone()[0]
+        _apply_evaluation_stats(cursor, instructor_id, subject, term,
+                                (teaching_quality, course_content, communication, overall_rating), 1)
+        return evaluation_id
+    return _writer.submit(insert, on_commit=lambda _: bump_table_version('evaluations'))
+
+# Add an evaluation (replacing the student's earlier one for the same instructor and subject)
+def add_evaluation(student_id, instructor_id, subject, teaching_quality, course_content, communication, overall_rating, comments):
+    try:
+        queue_add_evaluation(student_id, instructor_id, subject, teaching_quality, course_content,
+                             communication, overall_rating, comments).result(WRITE_TIMEOUT)
         return True
     except Exception as e:
         print(f"Error adding evaluation: {str(e)}")
         return False
-    finally:
-        conn.close()
 
-# Get evaluations for an instructor
-def get_instructor_evaluations(instructor_id):
-    conn = sqlite3.connect('study_hub.db')
+# Get evaluations for an instructor, newest first; pass page_size to get (rows, next_cursor) pages
+def get_instructor_evaluations(instructor_id, page_size=None, cursor_value=None):
+    after = decode_cursor(cursor_value, 2) if cursor_value else None
+    conn = get_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute('''
+        query = '''
             SELECT e.id, s.fullname as student_name, e.subject, e.teaching_quality, 
                    e.course_content, e.communication, e.overall_rating, e.comments, e.created_at
             FROM evaluations e
             JOIN students s ON e.student_id = s.id
             WHERE e.instructor_id = ?
-            ORDER BY e.created_at DESC
-        ''', (instructor_id,))
+        '''
+        params = [instructor_id]
+        if after:
+            query += ' AND (e.created_at, e.id) < (?, ?)'
+            params.extend(after)
+        query += ' ORDER BY e.created_at DESC, e.id DESC'
+        if page_size:
+            query += ' LIMIT ?'
+            params.append(page_size + 1)
+        cursor.execute(query, params)
         results = cursor.fetchall()
-        return [{
+
+        next_cursor = None
+        if page_size and len(results) > page_size:
+            results = results[:page_size]
+            next_cursor = encode_cursor((results[-1][8], results[-1][0]))
+
+        evaluations = [{
             'id': row[0], 'student_name': row[1], 'subject': row[2], 'teaching_quality': row[3],
             'course_content': row[4], 'communication': row[5], 'overall_rating': row[6], 
             'comments': row[7], 'created_at': row[8]
         } for row in results]
+        return (evaluations, next_cursor) if page_size else evaluations
     except Exception as e:
         print(f"Error getting instructor evaluations: {str(e)}")
-        return []
+        return ([], None) if page_size else []
+    finally:
+        release_connection(conn)
+
+# Get an instructor's rating aggregates per subject and term, newest term first
+def get_instructor_evaluation_summary(instructor_id):
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('''
+            SELECT subject, term, evaluations, teaching_quality_sum, course_content_sum,
+                   communication_sum, overall_rating_sum,
+                   overall_1, overall_2, overall_3, overall_4, overall_5
+            FROM evaluation_stats
+            WHERE instructor_id = ?
+            ORDER BY term DESC, subject
+        ''', (instructor_id,))
+        return [{
+            'subject': row[0], 'term': row[1], 'evaluations': row[2],
+            'teaching_quality_sum': row[3], 'course_content_sum': row[4],
+            'communication_sum': row[5], 'overall_rating_sum': row[6],
+            'overall_histogram': list(row[7:12])
+        } for row in cursor.fetchall()]
     finally:
-        conn.close()
+        release_connection(conn)
 
 # Get all instructors for evaluation selection
 def get_all_instructors():
-    conn = sqlite3.connect('study_hub.db')
+    conn = get_connection()
     cursor = conn.cursor()
     try:
         cursor.execute('SELECT id, username, fullname, subject FROM instructors ORDER BY fullname')
@@ -576,7 +1271,83 @@ def get_all_instructors():
         print(f"Error getting instructors: {str(e)}")
         return []
     finally:
-        conn.close()
+        release_connection(conn)
+
+# Columns of a learning resource, in the order of the dicts built by _resource_from_row
+RESOURCE_COLUMNS = ('id', 'title', 'description', 'subject', 'resource_type', 'tags', 'url', 'drive_file_id', 'slug')
+
+# Helper: resource row as a dict, tags split into a list
+def _resource_from_row(row):
+    resource = dict(zip(RESOURCE_COLUMNS, row))
+    resource['tags'] = [tag for tag in resource['tags'].split(',') if tag]
+    return resource
+
+# Helper: tags normalised to the stored comma-separated form
+def _join_tags(tags):
+    if isinstance(tags, str):
+        tags = tags.split(',')
+    return ','.join(dict.fromkeys(tag.strip().lower() for tag in tags if tag.strip()))
+
+# Add a learning resource; returns its id
+def add_resource(title, description, subject, resource_type, tags=(), url=None, drive_file_id=None, slug=None):
+    def insert(cursor):
+        cursor.execute('''
+            INSERT INTO resources (title, description, subject, resource_type, tags, url, drive_file_id, slug)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (title, description, subject, resource_type, _join_tags(tags), url, drive_file_id, slug))
+        return cursor.lastrowid
+
+    try:
+        return _writer.submit(insert, on_commit=lambda _: bump_table_version('resources')).result(WRITE_TIMEOUT)
+    except Exception as e:
+        print(f"Error adding resource: {str(e)}")
+        return None
+
+# Update a learning resource's fields
+def update_resource(resource_id, title, description, subject, resource_type, tags=(), url=None, drive_file_id=None, slug=None):
+    def update(cursor):
+        cursor.execute('''
+            UPDATE resources
+            SET title = ?, description = ?, subject = ?, resource_type = ?, tags = ?, url = ?, drive_file_id = ?, slug = ?
+            WHERE id = ?
+        ''', (title, description, subject, resource_type, _join_tags(tags), url, drive_file_id, slug, resource_id))
+        return cursor.rowcount
+
+    try:
+        return _writer.submit(update, on_commit=lambda _: bump_table_version('resources')).result(WRITE_TIMEOUT) > 0
+    except Exception as e:
+        print(f"Error updating resource: {str(e)}")
+        return False
+
+# Delete a learning resource
+def delete_resource(resource_id):
+    def delete(cursor):
+        cursor.execute('DELETE FROM resources WHERE id = ?', (resource_id,))
+        return cursor.rowcount
+
+    try:
+        return _writer.submit(delete, on_commit=lambda _: bump_table_version('resources')).result(WRITE_TIMEOUT) > 0
+    except Exception as e:
+        print(f"Error deleting resource: {str(e)}")
+        return False
+
+# Get every learning resource (used to build the in-memory search index)
+def get_all_resources():
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f'SELECT {", ".join(RESOURCE_COLUMNS)} FROM resources ORDER BY id')
+        return [_resource_from_row(row) for row in cursor.fetchall()]
+    finally:
+        release_connection(conn)
 
-# Initialize the database when this module is imported
-init_db()
\ No newline at end of file
+# Get a downloadable resource by its slug
+def get_resource_by_slug(slug):
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f'SELECT {", ".join(RESOURCE_COLUMNS)} FROM resources WHERE slug = ?', (slug,))
+        row = cursor.fetchone()
+        return _resource_from_row(row) if row else None
+    finally:
+        release_connection(conn)
@@ -0,0 +1,112 @@
+# http_cache.py
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+from flask import request, current_app
+from database import get_table_version
+
+# Bounds of the in-memory store of serialized responses
+RESPONSE_CACHE_SIZE = 512
+RESPONSE_CACHE_MAX_BODY = 1024 * 1024
+
+class ResponseCache:
+    """LRU of serialized response bodies, each tagged with the table versions it was built from"""
+
+    def __init__(self, max_size=RESPONSE_CACHE_SIZE, max_body=RESPONSE_CACHE_MAX_BODY):
+        self.max_size = max_size
+        self.max_body = max_body
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, key, versions):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry['versions'] != versions:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        if len(entry['body']) > self.max_body:
+            return
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'max_size': self.max_size, 'hits': self.hits,
+                    'misses': self.misses, 'not_modified': self.not_modified}
+
+response_cache = ResponseCache()
+
+def _build_response(entry, cache_control):
+    """Response for a cached entry, or 304 when the client already has this ETag"""
+    # Weak comparison, as If-None-Match requires; compressed responses carry a weakened tag
+    if request.if_none_match.contains_weak(entry['etag']):
+        with response_cache._lock:
+            response_cache.not_modified += 1
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(entry['body'], status=200, mimetype=entry['mimetype'])
+    response.set_etag(entry['etag'])
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+def cached_response(tables=(), per_user=False, key_extra=None, max_age=0):
+    """Cache a read endpoint's serialized body until one of `tables` changes.
+
+    per_user adds the authenticated user (request.user, set by token_required) to the key;
+    key_extra is a callable for anything else the body depends on (e.g. today's date).
+    Responses get a strong ETag over the body and honour If-None-Match.
+    """
+    # max_age is meant for public data; everything else must be revalidated by the browser
+    cache_control = f'public, max-age={max_age}' if max_age and not per_user else 'private, no-cache'
+
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            key = (
+                f.__module__, f.__name__, request.path,
+                tuple(sorted(request.args.items(multi=True))),
+                request.user['user'] if per_user else None,
+                key_extra() if key_extra else None,
+            )
+            versions = tuple(get_table_version(table) for table in tables)
+
+            entry = response_cache.get(key, versions)
+            if entry is not None:
+                return _build_response(entry, cache_control)
+
+            response = current_app.make_response(f(*args, **kwargs))
+            # Only plain successful bodies are cached; errors and streams pass through untouched
+            if response.status_code != 200 or response.is_streamed:
+                return response
+
+            body = response.get_data()
+            entry = {
+                'versions': versions,
+                'etag': hashlib.blake2b(body, digest_size=16).hexdigest(),
+                'body': body,
+                'mimetype': response.mimetype,
+            }
+            response_cache.put(key, entry)
+            return _build_response(entry, cache_control)
+        return decorated
+    return decorator
+
+def get_response_cache_stats():
+    """Hit/miss counters of the response cache"""
+    return response_cache.stats()
@@ -0,0 +1,53 @@
+# identity.py
+import time
+import threading
+from collections import OrderedDict
+from flask import g, request
+from database import get_student_record, get_instructor_by_username, get_table_version
+
+# How long a resolved user record may be reused across requests; a write to the
+# students/instructors table in this process drops it sooner
+USER_CACHE_TTL = 60
+USER_CACHE_SIZE = 2048
+
+_user_cache = OrderedDict()
+_user_cache_lock = threading.Lock()
+
+_loaders = {
+    'student': (get_student_record, 'students'),
+    'instructor': (get_instructor_by_username, 'instructors'),
+}
+
+def resolve_user(user_type, username):
+    """Full student or instructor record for a username/email, memoized per request and per process"""
+    key = (user_type, username)
+    resolved = g.setdefault('resolved_users', {})
+    if key in resolved:
+        return resolved[key]
+
+    loader, table = _loaders[user_type]
+    version = get_table_version(table)
+    now = time.monotonic()
+    with _user_cache_lock:
+        entry = _user_cache.get(key)
+        if entry and entry[0] == version and entry[1] > now:
+            _user_cache.move_to_end(key)
+            resolved[key] = entry[2]
+            return entry[2]
+
+    record = loader(username)
+    with _user_cache_lock:
+        _user_cache[key] = (version, now + USER_CACHE_TTL, record)
+        _user_cache.move_to_end(key)
+        while len(_user_cache) > USER_CACHE_SIZE:
+            _user_cache.popitem(last=False)
+    resolved[key] = record
+    return record
+
+def current_student():
+    """Record of the student whose token authenticated this request"""
+    return resolve_user('student', request.user['user'])
+
+def current_instructor():
+    """Record of the instructor whose token authenticated this request"""
+    return resolve_user('instructor', request.user['user'])
@@ -0,0 +1,77 @@
+# passwords.py
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Werkzeug hash method for new and upgraded passwords, e.g. "scrypt:32768:8:1" or "pbkdf2:sha256:600000"
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+
+# Worker processes used for hashing; 0 hashes inline on the request thread
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1)))
+
+# Seconds a request waits for a hashing worker before giving up
+PASSWORD_HASH_TIMEOUT = 30
+
+# The pool starts on first use, when request, writer and notifier threads already exist; a forked
+# child could inherit one of their locks held, so workers come from a clean forkserver (or spawn)
+_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+_executor = None
+_executor_lock = threading.Lock()
+_method_prefix = None
+
+def _get_executor():
+    """Start the hashing process pool on first use"""
+    global _executor
+    if PASSWORD_HASH_WORKERS <= 0:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS,
+                                            mp_context=multiprocessing.get_context(_START_METHOD))
+        return _executor
+
+def configure_password_hashing(method=None, workers=None):
+    """Change the hash method and/or pool size; the pool is restarted on next use"""
+    global PASSWORD_HASH_METHOD, PASSWORD_HASH_WORKERS, _executor, _method_prefix
+    with _executor_lock:
+        if method is not None:
+            PASSWORD_HASH_METHOD = method
+            _method_prefix = None
+        if workers is not None:
+            PASSWORD_HASH_WORKERS = workers
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+                _executor = None
+
+def shutdown_password_pool():
+    """Stop the hashing workers; a new pool starts on next use"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+            _executor = None
+
+def hash_password(password):
+    """Hash a password with the configured method, off the request thread when a pool is configured"""
+    executor = _get_executor()
+    if executor is None:
+        return generate_password_hash(password, method=PASSWORD_HASH_METHOD)
+    return executor.submit(generate_password_hash, password, PASSWORD_HASH_METHOD).result(PASSWORD_HASH_TIMEOUT)
+
+def check_password(stored_hash, password):
+    """Check a password against a stored hash, off the request thread when a pool is configured"""
+    executor = _get_executor()
+    if executor is None:
+        return check_password_hash(stored_hash, password)
+    return executor.submit(check_password_hash, stored_hash, password).result(PASSWORD_HASH_TIMEOUT)
+
+def needs_rehash(stored_hash):
+    """True when a stored hash was made with different parameters than PASSWORD_HASH_METHOD"""
+    global _method_prefix
+    if _method_prefix is None:
+        # Werkzeug normalises the method (e.g. "scrypt" -> "scrypt:32768:8:1"), so ask it once
+        _method_prefix = generate_password_hash('', method=PASSWORD_HASH_METHOD).split('$', 1)[0]
+    return stored_hash.split('$', 1)[0] != _method_prefix
@@ -0,0 +1,111 @@
+# resource_index.py
+import re
+import bisect
+import threading
+from database import get_all_resources, get_table_version
+
+WORD = re.compile(r'[a-z0-9+#]+')
+
+def _words(text):
+    return WORD.findall((text or '').lower())
+
+class ResourceIndex:
+    """In-memory view of the resources table with inverted indexes for keyword, tag, subject and type.
+
+    The whole view is rebuilt from the database whenever the resources table version moves,
+    so searches never query SQLite and never see a half-updated index.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._view = None
+
+    def _build(self):
+        resources = get_all_resources()
+        # Display order: title, then id; postings hold positions in this order
+        resources.sort(key=lambda resource: (resource['title'].lower(), resource['id']))
+        keywords, tags, subjects, types = {}, {}, {}, {}
+        for position, resource in enumerate(resources):
+            text = ' '.join([resource['title'], resource['description'], resource['subject'] or '',
+                             ' '.join(resource['tags'])])
+            for word in set(_words(text)):
+                keywords.setdefault(word, set()).add(position)
+            for tag in resource['tags']:
+                tags.setdefault(tag, set()).add(position)
+            if resource['subject']:
+                subjects.setdefault(resource['subject'].lower(), set()).add(position)
+            types.setdefault(resource['resource_type'].lower(), set()).add(position)
+        return {
+            'resources': resources,
+            'keys': [[resource['title'].lower(), resource['id']] for resource in resources],
+            'keywords': keywords,
+            # Sorted vocabulary for prefix matching of the last, still-being-typed word
+            'vocabulary': sorted(keywords),
+            'tags': tags,
+            'subjects': subjects,
+            'types': types,
+        }
+
+    def _current(self):
+        version = get_table_version('resources')
+        with self._lock:
+            if self._view is None or self._version != version:
+                self._view = self._build()
+                self._version = version
+            return self._view
+
+    @staticmethod
+    def _prefix_matches(view, prefix):
+        vocabulary = view['vocabulary']
+        matches = set()
+        index = bisect.bisect_left(vocabulary, prefix)
+        while index < len(vocabulary) and vocabulary[index].startswith(prefix):
+            matches |= view['keywords'][vocabulary[index]]
+            index += 1
+        return matches
+
+    def search(self, query='', subject=None, tag=None, resource_type=None, after=None, limit=20):
+        """Resources matching every word of query (last word as a prefix) and the given filters.
+
+        Returns (page, total, next_key): up to `limit` resources in title order after the
+        [title, id] key `after`, the number of matches, and the key to continue from (or None).
+        """
+        view = self._current()
+        candidates = []
+        for index, value in (('subjects', subject), ('tags', tag), ('types', resource_type)):
+            if value:
+                candidates.append(view[index].get(value.strip().lower(), set()))
+        words = _words(query)
+        for word in words[:-1]:
+            candidates.append(view['keywords'].get(word, set()))
+        if words:
+            candidates.append(self._prefix_matches(view, words[-1]))
+
+        if candidates:
+            # Intersect smallest first so each step touches as few positions as possible
+            candidates.sort(key=len)
+            positions = set(candidates[0])
+            for posting in candidates[1:]:
+                positions &= posting
+                if not positions:
+                    break
+            positions = sorted(positions)
+        else:
+            positions = range(len(view['resources']))
+
+        # Keyset position, so a rebuild between two pages neither skips nor repeats resources
+        start = bisect.bisect_right(view['keys'], list(after)) if after else 0
+        first = bisect.bisect_left(positions, start)
+        selected = positions[first:first + limit]
+        page = [view['resources'][position] for position in selected]
+        has_more = first + limit < len(positions)
+        return page, len(positions), view['keys'][selected[-1]] if has_more and selected else None
+
+    def facets(self):
+        """Resource counts per subject, tag and type, for filter menus"""
+        view = self._current()
+        return {index: {value: len(posting) for value, posting in sorted(view[index].items())}
+                for index in ('subjects', 'tags', 'types')}
+
+resource_index = ResourceIndex()
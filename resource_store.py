@@ -0,0 +1,196 @@
+# resource_store.py
+import os
+import re
+import hashlib
+import tempfile
+import threading
+import shutil
+import urllib.request
+from collections import namedtuple
+from contextlib import contextmanager
+from urllib.parse import quote
+from flask import send_file
+
+# A stored file: where it is on disk, its sha256 (also the ETag) and size in bytes
+StoredResource = namedtuple('StoredResource', 'key path digest size')
+
+DRIVE_DOWNLOAD_URL = 'https://drive.usercontent.google.com/download?id={}&export=download&confirm=t'
+DRIVE_FILE_ID = re.compile(r'^[A-Za-z0-9_-]{10,}$')
+FETCH_TIMEOUT = 60
+CHUNK_SIZE = 1024 * 1024
+
+class ResourceError(Exception):
+    """Raised when a resource cannot be fetched from its source"""
+
+def drive_fetcher(file_id, fileobj):
+    """Default fetcher: stream a public Google Drive file into fileobj"""
+    if not DRIVE_FILE_ID.match(file_id):
+        raise ResourceError('Invalid Google Drive file id')
+    with urllib.request.urlopen(DRIVE_DOWNLOAD_URL.format(quote(file_id)), timeout=FETCH_TIMEOUT) as response:
+        # Drive answers with an HTML page instead of the file for private or missing files
+        if response.headers.get_content_type() == 'text/html':
+            raise ResourceError('Google Drive did not return a file')
+        shutil.copyfileobj(response, fileobj, CHUNK_SIZE)
+
+class _HashingWriter:
+    """File wrapper that hashes and counts everything the fetcher writes"""
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.hash = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.hash.update(data)
+        self.size += len(data)
+        return self.fileobj.write(data)
+
+class ResourceStore:
+    """Content-addressed file store: objects/<sha256> holds the bytes, refs/<key> names the object.
+
+    Every file is written to a temp file and renamed into place, so readers never see a partial
+    file; concurrent misses for the same key wait for a single fetch instead of starting their own.
+    """
+
+    def __init__(self, root, fetcher=drive_fetcher):
+        self.root = root
+        self.fetcher = fetcher
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._stats = {'hits': 0, 'misses': 0, 'fetches': 0, 'waits': 0, 'errors': 0}
+
+    def _objects_dir(self):
+        return os.path.join(self.root, 'objects')
+
+    def _ref_path(self, key):
+        return os.path.join(self.root, 'refs', key)
+
+    def _object_path(self, digest):
+        return os.path.join(self._objects_dir(), digest[:2], digest)
+
+    def _tmp_dir(self):
+        path = os.path.join(self.root, 'tmp')
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    @staticmethod
+    def _check_key(key):
+        if not key or key != os.path.basename(key) or key.startswith('.'):
+            raise ValueError(f'Invalid resource key: {key!r}')
+
+    def get(self, key):
+        """The stored resource for key, or None"""
+        self._check_key(key)
+        try:
+            with open(self._ref_path(key)) as ref:
+                digest = ref.read().strip()
+            path = self._object_path(digest)
+            return StoredResource(key, path, digest, os.path.getsize(path))
+        except FileNotFoundError:
+            pass
+        # Files saved by the old download code sit directly in the resources folder
+        legacy_path = os.path.join(self.root, key)
+        if os.path.isfile(legacy_path):
+            with open(legacy_path, 'rb') as legacy:
+                return self.put(key, legacy)
+        return None
+
+    def put(self, key, fileobj):
+        """Store the contents of a readable file object under key"""
+        return self._write(key, lambda out: shutil.copyfileobj(fileobj, out, CHUNK_SIZE))
+
+    def _write(self, key, produce):
+        self._check_key(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self._tmp_dir())
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                writer = _HashingWriter(tmp)
+                produce(writer)
+                tmp.flush()
+                os.fsync(tmp.fileno())
+            digest = writer.hash.hexdigest()
+            path = self._object_path(digest)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Identical content is stored once; rename is atomic within the same filesystem
+            if os.path.exists(path):
+                os.unlink(tmp_path)
+            else:
+                os.replace(tmp_path, path)
+            self._write_ref(key, digest)
+            return StoredResource(key, path, digest, writer.size)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def _write_ref(self, key, digest):
+        os.makedirs(os.path.dirname(self._ref_path(key)), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self._tmp_dir())
+        with os.fdopen(fd, 'w') as tmp:
+            tmp.write(digest)
+        os.replace(tmp_path, self._ref_path(key))
+
+    @contextmanager
+    def _single_flight(self, key):
+        """Per-key lock, dropped again once nobody holds or waits for it"""
+        with self._lock:
+            entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            if not entry[0].acquire(blocking=False):
+                with self._lock:
+                    self._stats['waits'] += 1
+                entry[0].acquire()
+            try:
+                yield
+            finally:
+                entry[0].release()
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._key_locks[key]
+
+    def fetch(self, key, source):
+        """The resource for key, fetched from source with the store's fetcher on a miss"""
+        resource = self.get(key)
+        if resource is not None:
+            with self._lock:
+                self._stats['hits'] += 1
+            return resource
+
+        with self._single_flight(key):
+            # Another request may have finished the fetch while this one waited
+            resource = self.get(key)
+            if resource is not None:
+                with self._lock:
+                    self._stats['hits'] += 1
+                return resource
+            with self._lock:
+                self._stats['misses'] += 1
+            try:
+                resource = self._write(key, lambda out: self.fetcher(source, out))
+            except Exception:
+                with self._lock:
+                    self._stats['errors'] += 1
+                raise
+            with self._lock:
+                self._stats['fetches'] += 1
+            return resource
+
+    def stats(self):
+        """Hit/miss/fetch counters; waits counts requests that joined an in-flight fetch"""
+        with self._lock:
+            return dict(self._stats, in_flight=len(self._key_locks))
+
+def send_resource(resource, download_name, mimetype, max_age=3600):
+    """Serve a stored file with its content hash as ETag; send_file answers Range and conditional requests"""
+    return send_file(
+        resource.path,
+        as_attachment=True,
+        download_name=download_name,
+        mimetype=mimetype,
+        etag=resource.digest,
+        conditional=True,
+        max_age=max_age
+    )
@@ -1,10 +1,40 @@
 document.addEventListener('DOMContentLoaded', function() {
+    // Cursor for the next page of evaluations, null when everything is shown
+    let nextCursor = null;
+    const shownEvaluations = [];
+
+    loadSummary();
     loadEvaluations();
     
+    function loadSummary() {
+        const token = localStorage.getItem('instructorToken');
+        
+        fetch('/api/instructor/evaluations/summary', {
+            headers: {
+                'Authorization': `Bearer ${token}`,
+                'Content-Type': 'application/json'
+            }
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                updateStats(data.totals);
+            } else {
+                console.error('Error loading evaluation summary:', data.message);
+            }
+        })
+        .catch(error => {
+            console.error('Error loading evaluation summary:', error);
+        });
+    }
+    
     function loadEvaluations() {
         const token = localStorage.getItem('instructorToken');
+        const url = nextCursor
+            ? `/api/instructor/evaluations?cursor=${encodeURIComponent(nextCursor)}`
+            : '/api/instructor/evaluations';
         
-        fetch('/api/instructor/evaluations', {
+        fetch(url, {
             headers: {
                 'Authorization': `Bearer ${token}`,
                 'Content-Type': 'application/json'
@@ -13,8 +43,9 @@ document.addEventListener('DOMContentLoaded', function() {
         .then(response => response.json())
         .then(data => {
             if (data.success) {
-                displayEvaluations(data.evaluations);
-                updateStats(data.evaluations);
+                shownEvaluations.push(...data.evaluations);
+                nextCursor = data.next_cursor;
+                displayEvaluations(shownEvaluations);
             } else {
                 console.error('Error loading evaluations:', data.message);
             }
@@ -78,19 +109,18 @@ document.addEventListener('DOMContentLoaded', function() {
                     </div>
                 ` : ''}
             </div>
-        `).join('');
+        `).join('') + (nextCursor ? '<button id="loadMoreEvaluations" class="btn-back">Load More</button>' : '');
+
+        const loadMoreButton = document.getElementById('loadMoreEvaluations');
+        if (loadMoreButton) {
+            loadMoreButton.addEventListener('click', loadEvaluations);
+        }
     }
     
-    function updateStats(evaluations) {
-        const totalEvaluations = evaluations.length;
-        const averageRating = totalEvaluations > 0 ? 
-            (evaluations.reduce((sum, eval) => sum + eval.overall_rating, 0) / totalEvaluations).toFixed(1) : 0;
-        const highestRating = totalEvaluations > 0 ? 
-            Math.max(...evaluations.map(eval => eval.overall_rating)) : 0;
-        
-        document.getElementById('totalEvaluations').textContent = totalEvaluations;
-        document.getElementById('averageRating').textContent = averageRating;
-        document.getElementById('highestRating').textContent = highestRating;
+    function updateStats(totals) {
+        document.getElementById('totalEvaluations').textContent = totals.evaluations;
+        document.getElementById('averageRating').textContent = totals.overall_rating_avg.toFixed(1);
+        document.getElementById('highestRating').textContent = totals.highest_rating;
     }
     
     function generateStars(rating) {
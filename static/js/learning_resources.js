@@ -30,46 +30,132 @@ function loadStudentInfo() {
     });
 }
 
-function loadLearningResources() {
-    const token = localStorage.getItem('studentToken');
-    
+// Current search and the cursor of the next page (null when everything is shown)
+let resourceQuery = {};
+let nextResourceCursor = null;
+let resourceSearchTimer = null;
+
+function resourceSearchUrl(cursor) {
+    const params = new URLSearchParams();
+    Object.entries(resourceQuery).forEach(([key, value]) => {
+        if (value) params.append(key, value);
+    });
+    if (cursor) params.append('cursor', cursor);
+    return `/api/student/resources?${params.toString()}`;
+}
+
+function loadLearningResources(query = {}) {
+    resourceQuery = query;
+    nextResourceCursor = null;
+
     // Show loading animation
     document.getElementById('loadingAnimation').style.display = 'flex';
     document.getElementById('resourcesDisplay').style.display = 'none';
 
-    // Simulate loading time (5 seconds)
-    setTimeout(() => {
-        fetch('/api/student/resources', {
-            headers: {
-                'Authorization': `Bearer ${token}`
-            }
-        })
-        .then(response => response.json())
-        .then(data => {
-            // Hide loading animation
-            document.getElementById('loadingAnimation').style.display = 'none';
-            document.getElementById('resourcesDisplay').style.display = 'block';
-
-            if (data.success) {
-                displayResources(data.resources);
-            } else {
-                document.querySelector('.resources-grid').innerHTML = 
-                    `<p class="error">${data.message || 'Failed to load resources'}</p>`;
+    fetchResourcePage(null);
+}
+
+function fetchResourcePage(cursor) {
+    const token = localStorage.getItem('studentToken');
+
+    fetch(resourceSearchUrl(cursor), {
+        headers: {
+            'Authorization': `Bearer ${token}`
+        }
+    })
+    .then(response => response.json())
+    .then(data => {
+        // Hide loading animation
+        document.getElementById('loadingAnimation').style.display = 'none';
+        document.getElementById('resourcesDisplay').style.display = 'block';
+
+        if (data.success) {
+            if (data.facets) {
+                displayResourceFilters(data.facets);
             }
-        })
-        .catch(error => {
-            document.getElementById('loadingAnimation').style.display = 'none';
-            document.getElementById('resourcesDisplay').style.display = 'block';
+            displayResources(data.resources, Boolean(cursor));
+            nextResourceCursor = data.next_cursor;
+            updateLoadMoreResources();
+        } else {
             document.querySelector('.resources-grid').innerHTML = 
-                '<p class="error">An error occurred while loading resources</p>';
+                `<p class="error">${data.message || 'Failed to load resources'}</p>`;
+        }
+    })
+    .catch(error => {
+        document.getElementById('loadingAnimation').style.display = 'none';
+        document.getElementById('resourcesDisplay').style.display = 'block';
+        document.querySelector('.resources-grid').innerHTML = 
+            '<p class="error">An error occurred while loading resources</p>';
+    });
+}
+
+// Search box and subject/type selects, created once above the grid
+function ensureResourceControls() {
+    let controls = document.getElementById('resourceControls');
+    if (controls) return controls;
+
+    controls = document.createElement('div');
+    controls.id = 'resourceControls';
+    controls.className = 'resource-controls';
+    controls.innerHTML = `
+        <input type="search" id="resourceSearch" placeholder="Search resources...">
+        <select id="resourceSubject"><option value="">All subjects</option></select>
+        <select id="resourceType"><option value="">All types</option></select>`;
+    const grid = document.querySelector('.resources-grid');
+    grid.parentNode.insertBefore(controls, grid);
+
+    const search = () => loadLearningResources({
+        q: document.getElementById('resourceSearch').value.trim(),
+        subject: document.getElementById('resourceSubject').value,
+        type: document.getElementById('resourceType').value
+    });
+    document.getElementById('resourceSearch').addEventListener('input', () => {
+        clearTimeout(resourceSearchTimer);
+        resourceSearchTimer = setTimeout(search, 250);
+    });
+    document.getElementById('resourceSubject').addEventListener('change', search);
+    document.getElementById('resourceType').addEventListener('change', search);
+    return controls;
+}
+
+function displayResourceFilters(facets) {
+    ensureResourceControls();
+    [['resourceSubject', facets.subjects], ['resourceType', facets.types]].forEach(([id, counts]) => {
+        const select = document.getElementById(id);
+        if (select.options.length > 1) return;
+        Object.keys(counts).forEach(value => {
+            const option = document.createElement('option');
+            option.value = value;
+            option.textContent = `${value} (${counts[value]})`;
+            select.appendChild(option);
         });
-    }, 5000);
+    });
 }
 
-function displayResources(resources) {
+function updateLoadMoreResources() {
+    let button = document.getElementById('loadMoreResources');
+    if (!button) {
+        button = document.createElement('button');
+        button.id = 'loadMoreResources';
+        button.className = 'btn-resource';
+        button.textContent = 'Load More';
+        button.addEventListener('click', () => fetchResourcePage(nextResourceCursor));
+        const grid = document.querySelector('.resources-grid');
+        grid.parentNode.insertBefore(button, grid.nextSibling);
+    }
+    button.style.display = nextResourceCursor ? 'inline-block' : 'none';
+}
+
+function escapeResourceText(text) {
+    const div = document.createElement('div');
+    div.textContent = text || '';
+    return div.innerHTML;
+}
+
+function displayResources(resources, append = false) {
     const resourcesGrid = document.querySelector('.resources-grid');
     
-    if (resources.length === 0) {
+    if (resources.length === 0 && !append) {
         resourcesGrid.innerHTML = '<p class="no-resources">No learning resources available.</p>';
         return;
     }
@@ -78,17 +164,21 @@ function displayResources(resources) {
     resources.forEach(resource => {
         html += `
         <div class="resource-card">
-            <h3>${resource.title}</h3>
-            <p>${resource.description}</p>
+            <h3>${escapeResourceText(resource.title)}</h3>
+            <p>${escapeResourceText(resource.description)}</p>
             <div class="resource-actions">
-                <a href="${resource.link}" target="_blank" class="btn-resource">
+                <a href="${encodeURI(resource.link || '#')}" target="_blank" class="btn-resource">
                     <i class="fas fa-external-link-alt"></i> View Resource
                 </a>
             </div>
         </div>`;
     });
 
-    resourcesGrid.innerHTML = html;
+    if (append) {
+        resourcesGrid.insertAdjacentHTML('beforeend', html);
+    } else {
+        resourcesGrid.innerHTML = html;
+    }
 }
 
 function backToDashboard() {
@@ -7,31 +7,60 @@ function checkAuth() {
     }
 }
 
-// Load all results
+// Page size and cursor of the result list currently shown
+const PAGE_SIZE = 100;
+let resultsQuery = '/api/results';
+let nextCursor = null;
+
+// Fetch one page of results for the current query
+async function fetchResultsPage(append) {
+    const token = localStorage.getItem('instructorToken');
+    const separator = resultsQuery.includes('?') ? '&' : '?';
+    let url = `${resultsQuery}${separator}page_size=${PAGE_SIZE}`;
+    if (append && nextCursor) {
+        url += `&cursor=${encodeURIComponent(nextCursor)}`;
+    }
+    const response = await fetch(url, {
+        headers: {
+            'Authorization': `Bearer ${token}`
+        }
+    });
+    const data = await response.json();
+
+    if (data.success) {
+        nextCursor = data.next_cursor;
+        displayResults(data.results, append);
+        document.getElementById('loadMoreBtn').style.display = nextCursor ? 'block' : 'none';
+    } else {
+        showError(data.message);
+    }
+}
+
+// Load the first page of all results
 async function loadResults() {
+    resultsQuery = '/api/results';
     try {
-        const token = localStorage.getItem('instructorToken');
-        const response = await fetch('/api/results', {
-            headers: {
-                'Authorization': `Bearer ${token}`
-            }
-        });
-        const data = await response.json();
-        
-        if (data.success) {
-            displayResults(data.results);
-        } else {
-            showError(data.message);
-        }
+        await fetchResultsPage(false);
+    } catch (error) {
+        showError('An error occurred while loading results');
+    }
+}
+
+// Load the next page of the current results
+async function loadMoreResults() {
+    try {
+        await fetchResultsPage(true);
     } catch (error) {
         showError('An error occurred while loading results');
     }
 }
 
 // Display results in the table
-function displayResults(results) {
+function displayResults(results, append = false) {
     const tbody = document.querySelector('#resultsTable tbody');
-    tbody.innerHTML = '';
+    if (!append) {
+        tbody.innerHTML = '';
+    }
 
     results.forEach(result => {
         const row = document.createElement('tr');
@@ -59,20 +88,9 @@ async function applyFilters() {
     const year = document.getElementById('yearFilter').value;
     const semester = document.getElementById('semesterFilter').value;
 
+    resultsQuery = `/api/results/filter?student=${encodeURIComponent(student)}&subject=${encodeURIComponent(subject)}&year=${year}&semester=${semester}`;
     try {
-        const token = localStorage.getItem('instructorToken');
-        const response = await fetch(`/api/results/filter?student=${student}&subject=${subject}&year=${year}&semester=${semester}`, {
-            headers: {
-                'Authorization': `Bearer ${token}`
-            }
-        });
-        const data = await response.json();
-        
-        if (data.success) {
-            displayResults(data.results);
-        } else {
-            showError(data.message);
-        }
+        await fetchResultsPage(false);
     } catch (error) {
         showError('An error occurred while filtering results');
     }
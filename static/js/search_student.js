@@ -100,10 +100,7 @@ document.addEventListener('DOMContentLoaded', function() {
             noResultsMessage.style.display = 'none';
 
             // Fetch and display real course results for this student
-            fetch(`/api/results/filter?student=${student.id}` , {
-                headers: headers
-            })
-            .then(response => response.json())
+            fetchStudentResults(student.id)
             .then(data => {
                 if (data.success && data.results.length > 0) {
                     // Group results by semester
@@ -152,6 +149,26 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
+    // Every result of one student: exact id filter, following next_cursor until the last page
+    async function fetchStudentResults(id) {
+        const results = [];
+        let cursor = null;
+        do {
+            let url = `/api/results/filter?student_id=${encodeURIComponent(id)}&page_size=500`;
+            if (cursor) {
+                url += `&cursor=${encodeURIComponent(cursor)}`;
+            }
+            const response = await fetch(url, { headers: headers });
+            const data = await response.json();
+            if (!data.success) {
+                return data;
+            }
+            results.push(...data.results);
+            cursor = data.next_cursor;
+        } while (cursor);
+        return { success: true, results: results };
+    }
+
     function showMessage(text, type) {
         message.textContent = text;
         message.className = `message ${type}`;
@@ -1,7 +1,7 @@
 # student_routes.py
 from flask import Blueprint, render_template, request, jsonify, redirect, current_app
 from utils import protected_route
-from database import get_student_results, get_all_future_tests, get_student_by_username, get_student_fullname
+from database import get_student_results, get_all_future_tests
 
 student_bp = Blueprint('student', __name__, url_prefix='/student')
 
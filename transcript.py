@@ -0,0 +1,81 @@
+# transcript.py
+import threading
+from database import get_connection, release_connection, get_table_version
+
+# Grade points on a 4.0 scale for the letter grades instructors enter
+GRADE_POINTS = {
+    'A+': 4.0, 'A': 4.0, 'A-': 3.7,
+    'B+': 3.3, 'B': 3.0, 'B-': 2.7,
+    'C+': 2.3, 'C': 2.0, 'C-': 1.7,
+    'D+': 1.3, 'D': 1.0, 'D-': 0.7,
+    'E': 0.0, 'F': 0.0,
+}
+
+# Used when a grade is not one of the letters above: (minimum marks, points)
+MARK_BANDS = ((80, 4.0), (70, 3.5), (60, 3.0), (50, 2.5), (45, 2.0), (40, 1.5), (0, 0.0))
+
+def _points_sql():
+    """SQL expression mapping a result row to grade points, letter grade first, marks as fallback"""
+    grades = ' '.join(f"WHEN '{grade}' THEN {points}" for grade, points in GRADE_POINTS.items())
+    bands = ' '.join(f'WHEN marks >= {minimum} THEN {points}' for minimum, points in MARK_BANDS)
+    return f'CASE UPPER(TRIM(grade)) {grades} ELSE CASE {bands} ELSE 0.0 END END'
+
+TRANSCRIPT_QUERY = f'''
+    SELECT academic_year, semester, COUNT(*), SUM(credits), SUM(credits * ({_points_sql()}))
+    FROM results
+    WHERE student_id = ?
+    GROUP BY academic_year, semester
+    ORDER BY academic_year, semester
+'''
+
+# Transcripts per student, valid while the results table version is unchanged
+_transcript_cache = {}
+_cache_lock = threading.Lock()
+TRANSCRIPT_CACHE_SIZE = 4096
+
+def compute_transcript(student_id):
+    """Credit-weighted GPA per semester and running CGPA, from one grouped query"""
+    conn = get_connection()
+    try:
+        rows = conn.execute(TRANSCRIPT_QUERY, (student_id,)).fetchall()
+    finally:
+        release_connection(conn)
+
+    semesters = []
+    total_credits = 0
+    total_points = 0.0
+    for academic_year, semester, subjects, credits, points in rows:
+        credits = credits or 0
+        points = points or 0.0
+        total_credits += credits
+        total_points += points
+        semesters.append({
+            'academic_year': academic_year,
+            'semester': semester,
+            'subjects': subjects,
+            'credits': credits,
+            'gpa': round(points / credits, 2) if credits else None,
+            'cumulative_credits': total_credits,
+            'cgpa': round(total_points / total_credits, 2) if total_credits else None,
+        })
+
+    return {
+        'semesters': semesters,
+        'total_credits': total_credits,
+        'cgpa': round(total_points / total_credits, 2) if total_credits else None,
+    }
+
+def get_transcript(student_id):
+    """Cached transcript; any add/update/delete of results moves the version and forces a recompute"""
+    version = get_table_version('results')
+    with _cache_lock:
+        cached = _transcript_cache.get(student_id)
+        if cached and cached[0] == version:
+            return cached[1]
+
+    transcript = compute_transcript(student_id)
+    with _cache_lock:
+        if len(_transcript_cache) >= TRANSCRIPT_CACHE_SIZE:
+            _transcript_cache.clear()
+        _transcript_cache[student_id] = (version, transcript)
+    return transcript
@@ -1,7 +1,81 @@
 # utils.py
 import jwt
+import time
+import hashlib
+import importlib
+import threading
+from collections import OrderedDict
 from flask import request, jsonify, redirect, current_app
-from functools import wraps
+from functools import wraps, lru_cache
+
+@lru_cache(maxsize=None)
+def optional_import(module_name):
+    """Import an optional, slow-to-load module on first use; None when it is not installed"""
+    try:
+        return importlib.import_module(module_name)
+    except ImportError:
+        return None
+
+class TokenCache:
+    """Bounded LRU of verified token claims, keyed by a digest of the token and signing key"""
+
+    def __init__(self, max_size=4096):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, claims):
+        with self._lock:
+            self._entries[key] = claims
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'max_size': self.max_size, 'hits': self.hits, 'misses': self.misses}
+
+token_cache = TokenCache()
+
+def decode_token(token):
+    """Verify a JWT once per process; repeats are served from the cache until the token's exp"""
+    secret = current_app.config['SECRET_KEY']
+    key = hashlib.sha256(secret.encode('utf-8') + b'\x00' + token.encode('utf-8')).digest()
+
+    claims = token_cache.get(key)
+    if claims is not None:
+        if 'exp' in claims and claims['exp'] <= time.time():
+            token_cache.discard(key)
+            raise jwt.ExpiredSignatureError('Signature has expired')
+        return dict(claims)
+
+    claims = jwt.decode(token, secret, algorithms=['HS256'])
+    token_cache.put(key, claims)
+    return dict(claims)
+
+def get_token_cache_stats():
+    """Hit/miss counters of the verified-token cache"""
+    return token_cache.stats()
 
 def get_token_from_request():
     """Extract token from header or cookies"""
@@ -18,7 +92,7 @@ def validate_token(token, expected_type=None):
         return None
         
     try:
-        data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
+        data = decode_token(token)
         if expected_type and data.get('type') != expected_type:
             return None
         return data
@@ -35,7 +109,7 @@ def token_required(allowed_types=("instructor",)):
                 return jsonify({'success': False, 'message': 'Token is missing'}), 401
 
             try:
-                data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
+                data = decode_token(token)
                 if data.get('type') not in allowed_types:
                     return jsonify({'success': False, 'message': 'Invalid token type'}), 401
                 request.user = data
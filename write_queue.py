@@ -0,0 +1,162 @@
+# write_queue.py
+import os
+import time
+import queue
+import atexit
+import weakref
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+# Most operations committed in one transaction, and how long the writer waits for more to arrive
+WRITE_BATCH_SIZE = int(os.environ.get('WRITE_BATCH_SIZE', 64))
+WRITE_BATCH_DELAY = float(os.environ.get('WRITE_BATCH_DELAY_MS', 2)) / 1000
+
+# Completed operations kept for the latency percentiles in stats()
+LATENCY_SAMPLES = 2048
+
+_STOP = object()
+
+class WriteQueue:
+    """Single writer thread that applies queued mutations in group commits.
+
+    submit() takes an operation (a callable receiving a cursor) and returns a Future of its
+    result. The writer collects up to batch_size operations, waiting at most batch_delay for
+    more, runs each in its own savepoint inside one transaction, and commits once. A failing
+    operation is rolled back alone and its future gets the exception; the others still commit.
+    Futures complete only after the commit, so callers read their own writes.
+    """
+
+    def __init__(self, connect, batch_size=WRITE_BATCH_SIZE, batch_delay=WRITE_BATCH_DELAY):
+        self.connect = connect
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._stats = {'submitted': 0, 'committed': 0, 'failed': 0, 'batches': 0, 'max_depth': 0}
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+                self._thread.start()
+                _running.add(self)
+
+    def submit(self, operation, *args, on_commit=None):
+        """Queue operation(cursor, *args); on_commit(result) runs on the writer after the commit"""
+        if self._thread is None:
+            self._start()
+        future = Future()
+        self._queue.put((operation, args, on_commit, future, time.monotonic()))
+        with self._lock:
+            self._stats['submitted'] += 1
+            self._stats['max_depth'] = max(self._stats['max_depth'], self._queue.qsize())
+        return future
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.batch_delay
+        while len(batch) < self.batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if item is _STOP:
+                # Finish this batch, then stop
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        conn = self.connect()
+        # Transactions are opened and committed explicitly below
+        conn.isolation_level = None
+        cursor = conn.cursor()
+        try:
+            while True:
+                first = self._queue.get()
+                if first is _STOP:
+                    break
+                self._apply(conn, cursor, self._collect(first))
+        finally:
+            conn.close()
+
+    def _apply(self, conn, cursor, batch):
+        results = []
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            for operation, args, _, _, _ in batch:
+                cursor.execute('SAVEPOINT op')
+                try:
+                    results.append((True, operation(cursor, *args)))
+                    cursor.execute('RELEASE op')
+                except Exception as e:
+                    cursor.execute('ROLLBACK TO op')
+                    cursor.execute('RELEASE op')
+                    results.append((False, e))
+            cursor.execute('COMMIT')
+        except Exception as e:
+            # BEGIN or COMMIT failed: nothing in the batch was written
+            if conn.in_transaction:
+                conn.rollback()
+            results = [(False, e)] * len(batch)
+
+        done = time.monotonic()
+        committed = failed = 0
+        for (_, _, on_commit, future, queued_at), (ok, value) in zip(batch, results):
+            self._latencies.append(done - queued_at)
+            if ok:
+                committed += 1
+                if on_commit is not None:
+                    try:
+                        on_commit(value)
+                    except Exception:
+                        pass
+                future.set_result(value)
+            else:
+                failed += 1
+                future.set_exception(value)
+        with self._lock:
+            self._stats['batches'] += 1
+            self._stats['committed'] += committed
+            self._stats['failed'] += failed
+
+    def close(self, timeout=10):
+        """Apply everything already queued, then stop the writer thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        _running.discard(self)
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def stats(self):
+        """Queue depth, batching and enqueue-to-commit latency (ms) counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            latencies = sorted(self._latencies)
+        stats['depth'] = self._queue.qsize()
+        stats['avg_batch'] = round(stats['committed'] / stats['batches'], 2) if stats['batches'] else 0
+        if latencies:
+            for name, fraction in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99)):
+                stats[f'latency_{name}_ms'] = round(latencies[int(fraction * (len(latencies) - 1))] * 1000, 3)
+            stats['latency_max_ms'] = round(latencies[-1] * 1000, 3)
+        return stats
+
+# Queues with a live writer thread; closed or discarded queues drop out on their own
+_running = weakref.WeakSet()
+
+@atexit.register
+def _flush_on_exit():
+    # The writer is a daemon thread; drain what is queued before the interpreter exits
+    for write_queue in list(_running):
+        write_queue.close()